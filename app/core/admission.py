@@ -0,0 +1,249 @@
+# app/core/admission.py
+"""
+Admission control for the prediction routes.
+
+Every route gets a number of concurrent slots and a bounded FIFO of waiting
+requests. A request that finds the queue full, or waits longer than
+ADMISSION_QUEUE_TIMEOUT for a slot, is shed right away with 503 + Retry-After
+instead of joining a threadpool backlog, so the admitted requests keep their
+normal latency under a spike. Optional per-client token buckets (429) stop one
+caller from taking every slot.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+
+from fastapi import Depends, HTTPException, Request
+
+from .guest import allow_guest_or_user
+from .metrics import METRICS_ENABLED, metrics, stage
+
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1") == "1"
+# concurrent requests per route; bulk routes (batch / arrow / sweep) hold a slot much longer
+ADMISSION_CONCURRENCY = int(os.environ.get("ADMISSION_CONCURRENCY", "64"))
+ADMISSION_BULK_CONCURRENCY = int(os.environ.get("ADMISSION_BULK_CONCURRENCY", "4"))
+# requests allowed to wait for a slot per route (0: shed as soon as every slot is busy)
+ADMISSION_QUEUE = int(os.environ.get("ADMISSION_QUEUE", "128"))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "0.5"))  # seconds
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", "1"))  # seconds, sent with 503s
+# per-route overrides: "/predictions/offense=32:64,/predictions/defense/batch=2" (path=concurrency[:queue])
+ADMISSION_LIMITS = os.environ.get("ADMISSION_LIMITS", "")
+
+# per-client token bucket: sustained requests/second and burst size (0 disables)
+RATE_LIMIT_RPS = float(os.environ.get("RATE_LIMIT_RPS", "0"))
+RATE_LIMIT_BURST = int(os.environ.get("RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_CLIENTS = int(os.environ.get("RATE_LIMIT_CLIENTS", "10000"))  # buckets kept (LRU)
+
+_BULK_SUFFIXES = ("/batch", "/arrow", "/sweep")
+
+
+def _parse_limits(spec: str) -> dict:
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        path, _, value = item.partition("=")
+        concurrency, _, queue = value.partition(":")
+        limits[path.strip()] = (int(concurrency), int(queue) if queue else ADMISSION_QUEUE)
+    return limits
+
+
+class RouteLimiter:
+    """Concurrency slots plus a bounded FIFO wait queue for one route (event-loop only, no locks)."""
+
+    def __init__(self, concurrency: int, max_queue: int, timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self._waiters = deque()
+        self.stats = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_timeout": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.stats["shed_queue_full"] += 1
+            raise overloaded("queue full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["queued"] += 1
+        try:
+            # release() hands the slot over directly, so in_flight is already counted for us
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # the slot arrived just as the wait expired; take it
+                self.stats["admitted"] += 1
+                return
+            self._waiters.remove(waiter)
+            waiter.cancel()
+            self.stats["shed_timeout"] += 1
+            raise overloaded("queue timeout")
+        except asyncio.CancelledError:
+            # client went away while waiting; pass a slot we were just given on
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        self.stats["admitted"] += 1
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        return dict(
+            self.stats, in_flight=self.in_flight, queue_depth=self.queue_depth,
+            concurrency=self.concurrency, max_queue=self.max_queue,
+        )
+
+
+def overloaded(reason: str) -> HTTPException:
+    """503 with Retry-After for work shed under load (admission queues, coalescer queues)."""
+    return HTTPException(
+        status_code=503,
+        detail=f"Server overloaded ({reason}), retry shortly",
+        headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+    )
+
+
+class TokenBuckets:
+    """Per-client token buckets (rate tokens/second, up to burst), least recently seen clients evicted."""
+
+    def __init__(self, rate: float = RATE_LIMIT_RPS, burst: int = RATE_LIMIT_BURST, max_clients: int = RATE_LIMIT_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> [tokens, last refill]
+        self.limited = 0
+
+    def take(self, client: str) -> float:
+        """0.0 if the request may proceed, otherwise seconds until the client has a token again."""
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = [float(self.burst), now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return 0.0
+        self.limited += 1
+        return (1.0 - bucket[0]) / self.rate
+
+
+class AdmissionController:
+    """RouteLimiter per route path (created on first use) plus the shared client token buckets."""
+
+    def __init__(self):
+        self.overrides = _parse_limits(ADMISSION_LIMITS)
+        self.routes = {}
+        self.buckets = TokenBuckets() if RATE_LIMIT_RPS > 0 else None
+
+    def limiter(self, path: str) -> RouteLimiter:
+        limiter = self.routes.get(path)
+        if limiter is None:
+            if path in self.overrides:
+                concurrency, queue = self.overrides[path]
+            elif path.endswith(_BULK_SUFFIXES):
+                concurrency, queue = ADMISSION_BULK_CONCURRENCY, ADMISSION_QUEUE
+            else:
+                concurrency, queue = ADMISSION_CONCURRENCY, ADMISSION_QUEUE
+            limiter = self.routes[path] = RouteLimiter(concurrency, queue)
+        return limiter
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": True,
+            "routes": {path: limiter.snapshot() for path, limiter in sorted(self.routes.items())},
+            "rate_limit": None if self.buckets is None else {
+                "rps": self.buckets.rate,
+                "burst": self.buckets.burst,
+                "clients": len(self.buckets._buckets),
+                "limited": self.buckets.limited,
+            },
+        }
+
+    def collect(self) -> list:
+        lines = [
+            "# HELP playcaller_admission_in_flight Requests holding an admission slot",
+            "# TYPE playcaller_admission_in_flight gauge",
+        ]
+        routes = sorted(self.routes.items())
+        lines += [f'playcaller_admission_in_flight{{route="{p}"}} {r.in_flight}' for p, r in routes]
+        lines += [
+            "# HELP playcaller_admission_queue_depth Requests waiting for an admission slot",
+            "# TYPE playcaller_admission_queue_depth gauge",
+        ]
+        lines += [f'playcaller_admission_queue_depth{{route="{p}"}} {r.queue_depth}' for p, r in routes]
+        lines += [
+            "# HELP playcaller_admission_shed_total Requests rejected by admission control",
+            "# TYPE playcaller_admission_shed_total counter",
+        ]
+        for p, r in routes:
+            lines.append(f'playcaller_admission_shed_total{{route="{p}",reason="queue_full"}} {r.stats["shed_queue_full"]}')
+            lines.append(f'playcaller_admission_shed_total{{route="{p}",reason="queue_timeout"}} {r.stats["shed_timeout"]}')
+        if self.buckets is not None:
+            lines += [
+                "# HELP playcaller_rate_limited_total Requests rejected by the per-client rate limit",
+                "# TYPE playcaller_rate_limited_total counter",
+                f"playcaller_rate_limited_total {self.buckets.limited}",
+            ]
+        return lines
+
+
+admission = AdmissionController() if ADMISSION_ENABLED else None
+
+if admission is not None and METRICS_ENABLED:
+    metrics.add_collector(admission.collect)
+
+
+def client_key(request: Request, user: str) -> str:
+    # every guest shares the "guest" identity; tell them apart by address
+    if user == "guest" and request.client is not None:
+        return f"guest:{request.client.host}"
+    return user
+
+
+async def admit(request: Request, user=Depends(allow_guest_or_user)):
+    """
+    Router dependency: rate-limit the caller, then hold one of the route's slots
+    until the response has been produced. Auth runs first, so unauthenticated
+    requests never take a slot.
+    """
+    if admission is None:
+        yield user
+        return
+    if admission.buckets is not None:
+        wait = admission.buckets.take(client_key(request, user))
+        if wait > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(max(1, int(wait + 0.999)))},
+            )
+    route = request.scope.get("route")
+    limiter = admission.limiter(route.path if route is not None else request.url.path)
+    # time spent queued for a slot, reported apart from request validation
+    with stage("admission"):
+        await limiter.acquire()
+    try:
+        yield user
+    finally:
+        limiter.release()
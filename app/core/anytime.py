@@ -0,0 +1,82 @@
+# app/core/anytime.py
+"""
+Anytime forest evaluation.
+
+A random forest's vote is the mean of its trees' class distributions, so the
+trees can be evaluated a chunk at a time and the running mean returned early:
+once the leading class is statistically settled (the full-forest vote would
+almost certainly pick it too) or once the request's latency budget is spent.
+"""
+import os
+import time
+
+import numpy as np
+
+# trees evaluated between two stopping checks
+ANYTIME_CHUNK = int(os.environ.get("ANYTIME_CHUNK", "8"))
+# never stop on the statistical test before this many trees (the budget can stop earlier)
+ANYTIME_MIN_TREES = int(os.environ.get("ANYTIME_MIN_TREES", "16"))
+# z-score the top-2 margin must clear; 3.0 is a one-sided ~99.9% test
+ANYTIME_Z = float(os.environ.get("ANYTIME_Z", "3.0"))
+
+
+def n_trees(model) -> int:
+    return len(model.estimators_) if hasattr(model, "estimators_") else model.n_estimators
+
+
+def tree_proba(model, X: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """Class distribution of trees [start, stop), shape (n_trees, n_rows, n_classes)."""
+    if hasattr(model, "tree_proba"):
+        # CompiledForest / CompactForest
+        return model.tree_proba(X, start, stop)
+    # X is already C-contiguous float32, so the per-tree input validation can be skipped
+    return np.stack([est.predict_proba(X, check_input=False) for est in model.estimators_[start:stop]])
+
+
+def _settled(P: np.ndarray, total: int, z: float, min_trees: int) -> bool:
+    """True when the leading class of every row is unlikely to change over the remaining trees."""
+    t = P.shape[0]
+    if t >= total or P.shape[2] == 1:
+        return True
+    mean = P.mean(axis=0)
+    top2 = np.argsort(mean, axis=1)[:, -2:]
+    rows = np.arange(P.shape[1])
+    # per-tree margin of the current leader over the runner-up
+    margin = P[:, rows, top2[:, 1]] - P[:, rows, top2[:, 0]]
+    lead = margin.mean(axis=0)
+    # even if every remaining tree voted fully for the runner-up, the leader stays ahead
+    if np.all(lead * t > total - t):
+        return True
+    if t < min_trees:
+        return False
+    # the trees are an i.i.d. sample of the forest: test the full-forest margin with a
+    # finite-population correction, so the bound tightens as the forest is used up
+    stderr = margin.std(axis=0, ddof=1) / np.sqrt(t) * np.sqrt((total - t) / (total - 1))
+    return bool(np.all(lead - z * stderr > 0))
+
+
+def anytime_proba(model, X, deadline: float = None, chunk: int = ANYTIME_CHUNK,
+                  min_trees: int = ANYTIME_MIN_TREES, z: float = ANYTIME_Z):
+    """
+    (probabilities, trees evaluated) for X. Trees are evaluated `chunk` at a time
+    until the vote is settled or time.perf_counter() passes `deadline`; at least
+    one chunk is always evaluated.
+    """
+    X = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+    total = n_trees(model)
+    chunks = []
+    evaluated = 0
+    while evaluated < total:
+        chunks.append(tree_proba(model, X, evaluated, evaluated + chunk))
+        evaluated = min(evaluated + chunk, total)
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        if _settled(np.concatenate(chunks), total, z, min_trees):
+            break
+    return np.concatenate(chunks).mean(axis=0), evaluated
+
+
+def anytime_single(model, X: np.ndarray, deadline: float = None):
+    """Label, probabilities and trees evaluated for a one-row matrix."""
+    probs, evaluated = anytime_proba(model, X, deadline)
+    return model.classes_.take(probs.argmax(axis=1)).tolist()[0], probs[0].tolist(), evaluated
@@ -0,0 +1,85 @@
+# app/core/cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "4096"))  # entries per model, 0 disables
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "30"))  # seconds
+
+
+def canonical_key(payload) -> tuple:
+    """Order-independent key for a validated Pydantic payload (ints and equal floats collapse)."""
+    return tuple(sorted(
+        (k, float(v) if isinstance(v, (int, float)) else v) for k, v in payload.model_dump().items()
+    ))
+
+
+class PredictionCache:
+    """
+    Per-model LRU cache with a TTL. Entries are keyed on (model version, payload),
+    so a reloaded model never serves results from the previous version.
+    """
+
+    def __init__(self, maxsize: int = PREDICTION_CACHE_SIZE, ttl: float = PREDICTION_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._stats = {}
+
+    def _model_stats(self, name: str) -> dict:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        return stats
+
+    def get(self, name: str, version, key):
+        if self.maxsize <= 0:
+            return None
+        with self._lock:
+            stats = self._model_stats(name)
+            entries = self._entries.get(name)
+            item = entries.get((version, key)) if entries is not None else None
+            if item is None:
+                stats["misses"] += 1
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del entries[(version, key)]
+                stats["expirations"] += 1
+                stats["misses"] += 1
+                return None
+            entries.move_to_end((version, key))
+            stats["hits"] += 1
+            return value
+
+    def put(self, name: str, version, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            entries = self._entries.setdefault(name, OrderedDict())
+            entries[(version, key)] = (time.monotonic() + self.ttl, value)
+            entries.move_to_end((version, key))
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self._model_stats(name)["evictions"] += 1
+
+    def invalidate(self, name: str = None):
+        """Drop cached entries for one model (or all models), e.g. after a reload."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "models": {
+                    name: dict(stats, size=len(self._entries.get(name, ())))
+                    for name, stats in self._stats.items()
+                },
+            }
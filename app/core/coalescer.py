@@ -0,0 +1,124 @@
+# app/core/coalescer.py
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from .admission import overloaded
+
+# opt-in: gather concurrent single-row requests per model for up to this long (0 disables)
+COALESCE_WINDOW_MS = float(os.environ.get("COALESCE_WINDOW_MS", "0"))
+COALESCE_MAX_ROWS = int(os.environ.get("COALESCE_MAX_ROWS", "64"))
+# requests waiting per model; beyond this they are shed (503) instead of queueing behind one worker
+COALESCE_MAX_QUEUE = int(os.environ.get("COALESCE_MAX_QUEUE", "1024"))
+
+
+class _Batcher:
+    """Worker thread that drains one model's queue and scores each batch with one predict_proba."""
+
+    def __init__(self, name: str, window: float, max_rows: int, max_queue: int):
+        self.name = name
+        self.window = window
+        self.max_rows = max_rows
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"batches": 0, "rows": 0, "max_batch": 0, "errors": 0, "shed": 0}
+        self._thread = threading.Thread(target=self._run, name=f"coalesce-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, model, X: np.ndarray) -> Future:
+        future = Future()
+        try:
+            self.queue.put_nowait((model, X, future))
+        except queue.Full:
+            self.stats["shed"] += 1
+            raise overloaded(f"{self.name} batch queue full")
+        return future
+
+    def _collect(self) -> list:
+        items = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(items) < self.max_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                items.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            # a hot reload can swap the model mid-window; never score rows with a model they didn't ask for
+            groups = {}
+            for item in items:
+                groups.setdefault(id(item[0]), []).append(item)
+            for group in groups.values():
+                self._score(group)
+
+    def _score(self, items: list):
+        model = items[0][0]
+        try:
+            X = np.vstack([rows for _, rows, _ in items])
+            probs = model.predict_proba(X)
+            labels = model.classes_.take(probs.argmax(axis=1)).tolist()
+            probs = probs.tolist()
+        except Exception as e:
+            self.stats["errors"] += 1
+            for _, _, future in items:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for _, rows, future in items:
+            future.set_result((labels[offset], probs[offset]))
+            offset += len(rows)
+        self.stats["batches"] += 1
+        self.stats["rows"] += offset
+        self.stats["max_batch"] = max(self.stats["max_batch"], offset)
+
+
+class Coalescer:
+    """
+    Micro-batching layer for single-row predictions. Concurrent callers for the
+    same model are gathered for at most `window_ms` (or `max_rows` rows) and
+    scored together; each caller gets its own (label, probabilities) back.
+    The window bounds the extra latency a request picks up while batching, and
+    `max_queue` the backlog in front of each model's single worker: a full
+    queue answers 503 + Retry-After, like admission control.
+    """
+
+    def __init__(self, window_ms: float = COALESCE_WINDOW_MS, max_rows: int = COALESCE_MAX_ROWS,
+                 max_queue: int = COALESCE_MAX_QUEUE):
+        self.window = window_ms / 1000.0
+        self.max_rows = max_rows
+        self.max_queue = max_queue
+        self._batchers = {}
+        self._lock = threading.Lock()
+
+    def _batcher(self, name: str) -> _Batcher:
+        batcher = self._batchers.get(name)
+        if batcher is None:
+            with self._lock:
+                batcher = self._batchers.get(name)
+                if batcher is None:
+                    batcher = self._batchers[name] = _Batcher(name, self.window, self.max_rows, self.max_queue)
+        return batcher
+
+    def submit(self, name: str, model, X: np.ndarray) -> Future:
+        return self._batcher(name).submit(model, X)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_rows": self.max_rows,
+            "max_queue": self.max_queue,
+            "models": {
+                name: dict(b.stats, queued=b.queue.qsize(), mean_batch=round(b.stats["rows"] / b.stats["batches"], 2) if b.stats["batches"] else 0.0)
+                for name, b in self._batchers.items()
+            },
+        }
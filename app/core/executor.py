@@ -0,0 +1,136 @@
+# app/core/executor.py
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+
+from .model_store import ModelStore
+
+# worker processes for model inference (0 = score in the server process)
+INFERENCE_PROCESSES = int(os.environ.get("INFERENCE_PROCESSES", "0"))
+# submitted-but-unfinished requests before new ones are rejected with 503 (0 = 8 per process)
+INFERENCE_MAX_PENDING = int(os.environ.get("INFERENCE_MAX_PENDING", "0"))
+INFERENCE_TIMEOUT = float(os.environ.get("INFERENCE_TIMEOUT", "5"))
+
+# ---------- worker process side ----------
+_store = None
+
+
+def _init_worker(paths: dict, array_dir: str, compiled: list, mmap: bool, warmup: dict):
+    global _store
+    _store = ModelStore(paths, array_dir, compiled=compiled, mmap=mmap, warmup=warmup)
+    # load (and warm up) everything now, so no request pays a worker's first load
+    for name in _store:
+        _store.get(name)
+
+
+def _model(name: str, version):
+    model, active = _store.entry(name)
+    if version is not None and active != version:
+        # the server swapped in a new version; catch up before scoring
+        _store.refresh(background=False)
+        model, active = _store.entry(name)
+    if model is None:
+        raise RuntimeError(f"{name} not available in inference worker")
+    return model
+
+
+def _ping(hold: float = 0.0):
+    # holding the worker briefly makes the pool hand the next ping to another worker
+    time.sleep(hold)
+    return os.getpid()
+
+
+def _predict_single(name: str, version, X):
+    model = _model(name, version)
+    probs = model.predict_proba(X)
+    return model.classes_.take(probs.argmax(axis=1)).tolist()[0], probs[0].tolist()
+
+
+def _predict_proba(name: str, version, X):
+    return _model(name, version).predict_proba(X)
+
+
+# ---------- server side ----------
+class InferenceExecutor:
+    """
+    Pool of worker processes that each hold their own ModelStore, so forest
+    evaluation scales with cores instead of contending for the server's GIL.
+    Submission is bounded (503 when max_pending requests are in flight) and
+    each request waits at most `timeout` seconds (504). A job that times out
+    after a worker picked it up keeps its slot until the worker is done with it.
+    """
+
+    def __init__(self, paths: dict, array_dir: str, compiled=(), mmap: bool = True, warmup: dict = None,
+                 processes: int = INFERENCE_PROCESSES, max_pending: int = INFERENCE_MAX_PENDING,
+                 timeout: float = INFERENCE_TIMEOUT):
+        self.processes = processes
+        self.max_pending = max_pending or processes * 8
+        self.timeout = timeout
+        self.pending = 0
+        self.stats = {"submitted": 0, "completed": 0, "rejected": 0, "timeouts": 0, "errors": 0}
+        # spawn, not fork: the server process already runs threads (coalescer, model watcher)
+        self._pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(dict(paths), array_dir, list(compiled), mmap, warmup or {}),
+        )
+
+    def start(self):
+        """Spawn every worker and wait until each has loaded all models, rather than on the first requests."""
+        pids = set()
+        # a worker answers only after its initializer ran, so keep pinging until every one has answered
+        while len(pids) < self.processes:
+            pids |= {f.result() for f in [self._pool.submit(_ping, 0.05) for _ in range(self.processes * 2)]}
+        print(f"Inference workers started: {sorted(pids)}")
+
+    def _release(self, job):
+        # runs on the event loop thread only (see run), so the counter needs no lock
+        self.pending -= 1
+
+    async def run(self, fn, *args):
+        # runs on the event loop thread only, so the counter needs no lock
+        if self.pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise HTTPException(status_code=503, detail="Inference queue full", headers={"Retry-After": "1"})
+
+        loop = asyncio.get_running_loop()
+        job = self._pool.submit(fn, *args)
+        self.pending += 1
+        self.stats["submitted"] += 1
+        # the slot is freed when the worker is done with the job, not when the caller stops waiting
+        job.add_done_callback(lambda done: loop.call_soon_threadsafe(self._release, done))
+        future = asyncio.wrap_future(job)
+        try:
+            done, _ = await asyncio.wait([future], timeout=self.timeout)
+            if not done:
+                self.stats["timeouts"] += 1
+                raise HTTPException(status_code=504, detail="Inference timed out")
+            result = future.result()
+            self.stats["completed"] += 1
+            return result
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            raise HTTPException(status_code=503, detail=f"Inference failed: {e}")
+        finally:
+            # an unfinished job is dropped if no worker has started it; a running one ends in the background
+            future.cancel()
+
+    async def predict_single(self, name: str, version, X):
+        return await self.run(_predict_single, name, version, X)
+
+    async def predict_proba(self, name: str, version, X):
+        return await self.run(_predict_proba, name, version, X)
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, processes=self.processes, max_pending=self.max_pending,
+                    timeout_seconds=self.timeout, pending=self.pending)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
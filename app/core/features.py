@@ -0,0 +1,103 @@
+# app/core/features.py
+"""
+Feature pipeline shared by the API and the training scripts.
+
+Turns validated payloads or whole training frames into contiguous float32
+matrices whose columns follow OFFENSE_FEATURES / DEFENSE_FEATURES, which is
+the order the forests are trained on. Derived columns are computed with
+vectorized NumPy, so serving never builds a pandas object per request.
+"""
+import numpy as np
+
+# raw offense inputs (PlayInput fields / play-by-play CSV columns)
+OFFENSE_INPUTS = ["down", "ydstogo", "qtr", "yrdline100", "ScoreDiff"]
+
+OFFENSE_FEATURES = [
+    "down",
+    "ydstogo",
+    "qtr",
+    "yrdline100",
+    "red_zone",
+    "short_yard",
+    "third_long",
+    "half",
+    "ScoreDiff",
+]
+
+DEFENSE_FEATURES = [
+    "down",
+    "ydstogo",
+    "yardline_100",
+    "qtr",
+    "score_differential",
+    "quarter_seconds_remaining",
+]
+
+
+def offense_features(down, ydstogo, qtr, yrdline100, score_diff) -> np.ndarray:
+    """(n, 9) float32 offense matrix from 1-D input columns."""
+    down = np.asarray(down, dtype=np.float32)
+    ydstogo = np.asarray(ydstogo, dtype=np.float32)
+    qtr = np.asarray(qtr, dtype=np.float32)
+    yrdline100 = np.asarray(yrdline100, dtype=np.float32)
+
+    X = np.empty((down.shape[0], len(OFFENSE_FEATURES)), dtype=np.float32)
+    X[:, 0] = down
+    X[:, 1] = ydstogo
+    X[:, 2] = qtr
+    X[:, 3] = yrdline100
+    X[:, 4] = yrdline100 <= 20                       # red_zone
+    X[:, 5] = ydstogo <= 2                           # short_yard
+    X[:, 6] = (down == 3) & (ydstogo >= 8)           # third_long
+    X[:, 7] = (qtr == 1) | (qtr == 2)                # half
+    X[:, 8] = score_diff
+    return X
+
+
+def offense_matrix(rows) -> np.ndarray:
+    """Offense matrix from validated PlayInput payloads."""
+    raw = np.array([(r.down, r.ydstogo, r.qtr, r.yrdline100, r.ScoreDiff) for r in rows], dtype=np.float32)
+    return offense_features(raw[:, 0], raw[:, 1], raw[:, 2], raw[:, 3], raw[:, 4])
+
+
+def offense_matrix_from_frame(df) -> np.ndarray:
+    """Offense matrix from a frame with the OFFENSE_INPUTS columns (training data, lookup grids)."""
+    return offense_features(df["down"], df["ydstogo"], df["qtr"], df["yrdline100"], df["ScoreDiff"])
+
+
+def defense_features(*columns) -> np.ndarray:
+    """(n, 6) float32 defense matrix from 1-D input columns in DEFENSE_FEATURES order."""
+    X = np.empty((len(columns[0]), len(DEFENSE_FEATURES)), dtype=np.float32)
+    for i, col in enumerate(columns):
+        X[:, i] = col
+    return X
+
+
+def defense_matrix(rows) -> np.ndarray:
+    """Defense matrix from validated DefenseRequest payloads."""
+    return np.array(
+        [
+            (r.down, r.ydstogo, r.yardline_100, r.qtr, r.score_differential, r.quarter_seconds_remaining)
+            for r in rows
+        ],
+        dtype=np.float32,
+    ).reshape(-1, len(DEFENSE_FEATURES))
+
+
+def defense_matrix_from_frame(df) -> np.ndarray:
+    """Defense matrix from a frame with the DEFENSE_FEATURES columns."""
+    return np.ascontiguousarray(df[DEFENSE_FEATURES].to_numpy(dtype=np.float32))
+
+
+def grid_columns(base: dict, axes: list) -> dict:
+    """
+    {field: 1-D column} over the cartesian grid of axes [(field, values), ...]
+    with every other field held at its base value. Rows are in C order
+    (last axis varies fastest), so results reshape to the axes' lengths.
+    """
+    mesh = np.meshgrid(*(values for _, values in axes), indexing="ij")
+    n = mesh[0].size
+    columns = {field: np.full(n, value, dtype=np.float32) for field, value in base.items()}
+    for (field, _), grid in zip(axes, mesh):
+        columns[field] = grid.ravel().astype(np.float32)
+    return columns
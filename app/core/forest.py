@@ -0,0 +1,338 @@
+# app/core/forest.py
+import json
+import os
+
+import numpy as np
+
+ARRAY_FIELDS = ["feature", "threshold", "left", "right", "value", "roots"]
+
+# rows walked together; keeps the (rows x trees) node matrix a few MB however large the batch
+FOREST_BLOCK_ROWS = int(os.environ.get("FOREST_BLOCK_ROWS", "4096"))
+
+
+def leaf_distributions(tree) -> np.ndarray:
+    """
+    Per-node class distribution exactly as DecisionTreeClassifier.predict_proba
+    returns it: sklearn >= 1.4 stores fractions and returns them as they are,
+    older versions store counts and normalize them at predict time.
+    """
+    value = tree.value[:, 0, :].astype(np.float64)
+    normalizer = value.sum(axis=1, keepdims=True)
+    if np.allclose(normalizer, 1.0):
+        return value
+    normalizer[normalizer == 0.0] = 1.0
+    return value / normalizer
+
+
+def _blocked_proba(forest, X, table, leaf_rows) -> np.ndarray:
+    """
+    Mean leaf distribution over all trees, FOREST_BLOCK_ROWS rows at a time.
+
+    Distributions are summed tree by tree in estimator order and divided once,
+    as RandomForestClassifier.predict_proba does, so results are bit-identical
+    and no (rows x trees x classes) array is ever built.
+    """
+    X = forest._as_array(X)
+    proba = np.zeros((X.shape[0], table.shape[1]))
+    for start in range(0, X.shape[0], FOREST_BLOCK_ROWS):
+        block = proba[start:start + FOREST_BLOCK_ROWS]
+        rows = leaf_rows(forest.apply(X[start:start + FOREST_BLOCK_ROWS]))
+        for tree in range(rows.shape[1]):
+            block += table.take(rows[:, tree], axis=0)
+    proba /= len(forest.roots)
+    return proba
+
+
+def _flat_offsets(X: np.ndarray) -> np.ndarray:
+    """Offset of each row in X.ravel(), as a column to broadcast against node feature ids."""
+    return (np.arange(X.shape[0]) * X.shape[1])[:, None]
+
+
+class CompiledForest:
+    """
+    Array-backed evaluator for a fitted RandomForestClassifier.
+
+    All trees are flattened into one set of node arrays; leaves point back at
+    themselves so every row can walk every tree in lock-step for max_depth
+    steps with plain NumPy indexing. Exposes the parts of the sklearn API the
+    routers use (classes_, predict_proba, predict).
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes, feature_names=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.feature_names_in_ = feature_names
+        self.n_estimators = len(roots)
+        # [left, right] per node, so a step is one gather at 2 * node + went_right
+        self._children = np.stack([left, right], axis=1).ravel()
+
+    @classmethod
+    def from_sklearn(cls, model):
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for est in model.estimators_:
+            t = est.tree_
+            idx = np.arange(t.node_count, dtype=np.int64)
+            leaf = t.children_left == -1
+
+            feature = np.where(leaf, 0, t.feature).astype(np.int64)
+            left = np.where(leaf, idx, t.children_left) + offset
+            right = np.where(leaf, idx, t.children_right) + offset
+
+            features.append(feature)
+            thresholds.append(t.threshold.astype(np.float64))
+            lefts.append(left)
+            rights.append(right)
+            values.append(leaf_distributions(t))
+            roots.append(offset)
+
+            offset += t.node_count
+            max_depth = max(max_depth, t.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int64),
+            max_depth=max_depth,
+            classes=model.classes_,
+            feature_names=getattr(model, "feature_names_in_", None),
+        )
+
+    def save(self, path: str):
+        """Write one .npy per node array plus meta.json, so the model can be memory-mapped."""
+        os.makedirs(path, exist_ok=True)
+        for field in ARRAY_FIELDS:
+            np.save(os.path.join(path, field + ".npy"), getattr(self, field))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({
+                "max_depth": int(self.max_depth),
+                "classes": self.classes_.tolist(),
+                "feature_names": None if self.feature_names_in_ is None else list(self.feature_names_in_),
+            }, f)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = "r"):
+        """Load a saved forest; with mmap_mode the arrays stay in the OS page cache, shared across processes."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {field: np.load(os.path.join(path, field + ".npy"), mmap_mode=mmap_mode) for field in ARRAY_FIELDS}
+        feature_names = meta["feature_names"]
+        return cls(
+            max_depth=meta["max_depth"],
+            classes=np.asarray(meta["classes"]),
+            feature_names=None if feature_names is None else np.asarray(feature_names, dtype=object),
+            **arrays,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, field).nbytes for field in ARRAY_FIELDS)
+
+    def _as_array(self, X) -> np.ndarray:
+        if hasattr(X, "columns") and self.feature_names_in_ is not None:
+            X = X[list(self.feature_names_in_)]
+        # sklearn evaluates trees on float32 inputs; match it so splits land on the same side
+        return np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+
+    def apply(self, X, start: int = 0, stop: int = None) -> np.ndarray:
+        """Leaf node index reached in trees [start, stop) (default: all), shape (n_rows, n_trees)."""
+        X = self._as_array(X)
+        roots = self.roots[start:stop]
+        # 1-D take() gathers are several times faster than fancy indexing into X and the node arrays
+        values, offsets = X.ravel(), _flat_offsets(X)
+        nodes = np.broadcast_to(roots, (X.shape[0], len(roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = values.take(offsets + self.feature.take(nodes)) <= self.threshold.take(nodes)
+            nodes = self._children.take(2 * nodes + ~go_left)
+        return nodes
+
+    def tree_proba(self, X, start: int = 0, stop: int = None) -> np.ndarray:
+        """Class distribution of each tree in [start, stop), shape (n_trees, n_rows, n_classes)."""
+        return self.value.take(self.apply(X, start, stop).T, axis=0)
+
+    def predict_proba(self, X) -> np.ndarray:
+        return _blocked_proba(self, X, self.value, lambda nodes: nodes)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(self.predict_proba(X).argmax(axis=1))
+
+
+def _floor_float32(values: np.ndarray) -> np.ndarray:
+    """Largest float32 <= each value: for float32 x, x <= result exactly when x <= value."""
+    rounded = values.astype(np.float32)
+    over = rounded.astype(np.float64) > values
+    rounded[over] = np.nextafter(rounded[over], np.float32(-np.inf))
+    return rounded
+
+
+class CompactForest:
+    """
+    Compact, single-file (.npz) form of a fitted RandomForestClassifier.
+
+    Per node: int16 feature id, float32 threshold (rounded down, so splits
+    match sklearn's float64 comparison for every float32 input), one int32
+    child index (siblings are stored next to each other, so the right child is
+    child + 1; leaves point to themselves behind an infinite threshold) and an
+    index into a table of de-duplicated leaf class distributions. Subtrees
+    whose leaves all carry the same distribution can be pruned to one leaf.
+    Predictions are identical to the source forest's.
+    """
+
+    ARRAYS = ["feature", "threshold", "child", "leaf", "distributions", "roots"]
+
+    def __init__(self, feature, threshold, child, leaf, distributions, roots, max_depth, classes,
+                 feature_names=None, source_sha256=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.child = child
+        self.leaf = leaf
+        self.distributions = distributions
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.feature_names_in_ = feature_names
+        self.source_sha256 = source_sha256
+        self.n_estimators = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, model, prune: bool = True, source_sha256: str = None):
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests can be compacted")
+        if model.n_features_in_ > np.iinfo(np.int16).max:
+            raise ValueError("Too many features for int16 feature ids")
+
+        # only leaves are ever read; pruning merges leaves with one shared distribution, so the
+        # distinct leaf distributions are exactly the ones the pruned forest still references
+        values = np.concatenate([leaf_distributions(est.tree_) for est in model.estimators_])
+        is_leaf_node = np.concatenate([est.tree_.children_left == -1 for est in model.estimators_])
+        distributions, leaf_inverse = np.unique(values[is_leaf_node], axis=0, return_inverse=True)
+        inverse = np.full(len(values), -1, dtype=np.int64)
+        inverse[is_leaf_node] = leaf_inverse.reshape(-1)
+
+        features, thresholds, children, leaves, roots = [], [], [], [], []
+        offset = 0
+        node_offset = 0
+        max_depth = 0
+        for est in model.estimators_:
+            t = est.tree_
+            left, right = t.children_left, t.children_right
+            dist = inverse[node_offset:node_offset + t.node_count].copy()
+            node_offset += t.node_count
+            is_leaf = left == -1
+            if prune:
+                # children always have higher ids than their parent, so one reverse pass collapses bottom-up
+                for node in range(t.node_count - 1, -1, -1):
+                    if not is_leaf[node] and is_leaf[left[node]] and is_leaf[right[node]] \
+                            and dist[left[node]] == dist[right[node]]:
+                        is_leaf[node] = True
+                        dist[node] = dist[left[node]]
+
+            # breadth-first renumbering with siblings adjacent
+            order, depth = [0], [0]
+            position = {0: 0}
+            i = 0
+            while i < len(order):
+                node = order[i]
+                if not is_leaf[node]:
+                    position[left[node]] = len(order)
+                    position[right[node]] = len(order) + 1
+                    order += [left[node], right[node]]
+                    depth += [depth[i] + 1, depth[i] + 1]
+                i += 1
+            order = np.asarray(order)
+            leaf = is_leaf[order]
+            child = np.array([position[left[n]] if not is_leaf[n] else k for k, n in enumerate(order)], dtype=np.int64)
+
+            features.append(np.where(leaf, 0, t.feature[order]))
+            thresholds.append(np.where(leaf, np.inf, _floor_float32(t.threshold[order])).astype(np.float32))
+            children.append(child + offset)
+            leaves.append(np.where(leaf, dist[order], 0))
+            roots.append(offset)
+            offset += len(order)
+            max_depth = max(max_depth, depth[-1])
+
+        leaf_dtype = np.uint16 if len(distributions) <= np.iinfo(np.uint16).max else np.int32
+        return cls(
+            feature=np.concatenate(features).astype(np.int16),
+            threshold=np.concatenate(thresholds),
+            child=np.concatenate(children).astype(np.int32),
+            leaf=np.concatenate(leaves).astype(leaf_dtype),
+            distributions=distributions,
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            classes=model.classes_,
+            feature_names=getattr(model, "feature_names_in_", None),
+            source_sha256=source_sha256,
+        )
+
+    def save(self, path: str):
+        meta = {
+            "format": "compact-forest-v1",
+            "max_depth": int(self.max_depth),
+            "classes": self.classes_.tolist(),
+            "feature_names": None if self.feature_names_in_ is None else list(self.feature_names_in_),
+            "source_sha256": self.source_sha256,
+        }
+        with open(path, "wb") as f:
+            np.savez(f, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+                     **{field: getattr(self, field) for field in self.ARRAYS})
+
+    @staticmethod
+    def read_meta(path: str) -> dict:
+        with np.load(path) as data:
+            return json.loads(data["meta"].tobytes())
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes())
+            arrays = {field: data[field] for field in cls.ARRAYS}
+        feature_names = meta["feature_names"]
+        return cls(
+            max_depth=meta["max_depth"],
+            classes=np.asarray(meta["classes"]),
+            feature_names=None if feature_names is None else np.asarray(feature_names, dtype=object),
+            source_sha256=meta.get("source_sha256"),
+            **arrays,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, field).nbytes for field in self.ARRAYS)
+
+    _as_array = CompiledForest._as_array
+
+    def apply(self, X, start: int = 0, stop: int = None) -> np.ndarray:
+        """Node reached in trees [start, stop) (default: all), shape (n_rows, n_trees)."""
+        X = self._as_array(X)
+        roots = self.roots[start:stop]
+        values, offsets = X.ravel(), _flat_offsets(X)
+        nodes = np.broadcast_to(roots.astype(np.intp), (X.shape[0], len(roots))).copy()
+        for _ in range(self.max_depth):
+            go_right = values.take(offsets + self.feature.take(nodes)) > self.threshold.take(nodes)
+            nodes = self.child.take(nodes)
+            nodes += go_right
+        return nodes
+
+    def tree_proba(self, X, start: int = 0, stop: int = None) -> np.ndarray:
+        """Class distribution of each tree in [start, stop), shape (n_trees, n_rows, n_classes)."""
+        return self.distributions.take(self.leaf.take(self.apply(X, start, stop).T), axis=0)
+
+    def predict_proba(self, X) -> np.ndarray:
+        return _blocked_proba(self, X, self.distributions, self.leaf.take)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(self.predict_proba(X).argmax(axis=1))
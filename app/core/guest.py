@@ -1,5 +1,12 @@
+import os
+import secrets
 from fastapi import Header, HTTPException, Depends
 
+from .metrics import stage
+
+# admin endpoints are disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
 def allow_guest_or_user(
     x_guest: str | None = Header(default=None),
 ):
@@ -8,11 +15,35 @@ def allow_guest_or_user(
     - x-guest: true is present
     - OR later: valid authenticated user
     """
-    if x_guest == "true":
-        return "guest"
+    with stage("auth"):
+        if x_guest == "true":
+            return "guest"
 
     # later we can plug Supabase auth here
     raise HTTPException(
         status_code=401,
         detail="Authentication required"
     )
+
+def websocket_guest_or_user(websocket) -> str | None:
+    """
+    Same rule as allow_guest_or_user, checked once per WebSocket handshake.
+    Browsers can't set headers on WebSockets, so ?guest=true is accepted too.
+    """
+    with stage("auth"):
+        if websocket.headers.get("x-guest") == "true" or websocket.query_params.get("guest") == "true":
+            return "guest"
+    return None
+
+def require_admin(
+    x_admin_token: str | None = Header(default=None),
+):
+    """
+    Allows requests if x-admin-token matches the ADMIN_TOKEN env var.
+    """
+    if not ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=403,
+            detail="Admin token required"
+        )
+    return "admin"
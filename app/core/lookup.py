@@ -0,0 +1,146 @@
+# app/core/lookup.py
+import hashlib
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+from .forest import CompactForest
+
+# Realistic state grids. Each axis is (field, start, stop, step), stop inclusive.
+# Axes with step > 1 are buckets: a value is answered with the score of its bucket midpoint.
+OFFENSE_GRID = [
+    ("down", 1, 4, 1),
+    ("ydstogo", 1, 25, 1),
+    ("yrdline100", 1, 99, 1),
+    ("qtr", 1, 5, 1),
+    ("ScoreDiff", -28, 28, 1),
+]
+
+DEFENSE_GRID = [
+    ("down", 1, 4, 1),
+    ("ydstogo", 1, 15, 1),
+    ("yardline_100", 1, 99, 1),
+    ("qtr", 1, 5, 1),
+    ("score_differential", -14, 14, 1),
+    ("quarter_seconds_remaining", 0, 900, 150),
+]
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def model_sha256(path: str) -> str:
+    """
+    Content hash identifying a model. Compact exports (.npz) carry the hash of
+    the pickle they were made from: both files hold the same model, so they
+    share a version and its lookup tables.
+    """
+    if path.endswith(".npz"):
+        source = CompactForest.read_meta(path).get("source_sha256")
+        if source:
+            return source
+    return file_sha256(path)
+
+
+def axis_values(axis) -> np.ndarray:
+    """Grid point used for every index along an axis (bucket midpoints for step > 1)."""
+    _, start, stop, step = axis
+    starts = np.arange(start, stop + 1, step)
+    return np.minimum(starts + step // 2, stop) if step > 1 else starts
+
+
+class LookupTable:
+    """Dense probability table over a discrete state grid, indexed in O(1)."""
+
+    def __init__(self, probs: np.ndarray, axes: list, classes: list, model_sha256: str):
+        self.probs = probs
+        self.axes = [tuple(a) for a in axes]
+        self.classes = np.asarray(classes)
+        self.model_sha256 = model_sha256
+        self.shape = tuple(len(axis_values(a)) for a in self.axes)
+
+    @classmethod
+    def load(cls, path: str) -> "LookupTable":
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        probs = np.load(path + ".npy", mmap_mode="r")
+        return cls(probs, meta["axes"], meta["classes"], meta["model_sha256"])
+
+    def index(self, payload: dict) -> Optional[int]:
+        idx = []
+        for (field, start, stop, step), size in zip(self.axes, self.shape):
+            v = payload[field]
+            if v < start or v > stop:
+                return None
+            if step == 1 and v != int(v):
+                return None
+            idx.append(int((v - start) // step))
+        return int(np.ravel_multi_index(idx, self.shape))
+
+    def lookup(self, payload: dict) -> Optional[np.ndarray]:
+        i = self.index(payload)
+        if i is None:
+            return None
+        return self.probs[i]
+
+
+def build_table(model, axes: list, featurize, path: str, model_sha256: str, chunk_rows: int = 500_000) -> LookupTable:
+    """
+    Score every grid state with model and write <path>.npy / <path>.json.
+
+    featurize maps a raw-input DataFrame (one column per axis) to the model's
+    feature matrix (app.core.features). Rows are scored in chunks straight
+    into a memory-mapped file so memory stays bounded for large grids.
+    """
+    import pandas as pd
+
+    values = [axis_values(a) for a in axes]
+    shape = tuple(len(v) for v in values)
+    n_states = int(np.prod(shape))
+    n_classes = len(model.classes_)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    out = np.lib.format.open_memmap(path + ".npy", mode="w+", dtype=np.float32, shape=(n_states, n_classes))
+    for lo in range(0, n_states, chunk_rows):
+        flat = np.arange(lo, min(lo + chunk_rows, n_states))
+        idx = np.unravel_index(flat, shape)
+        raw = pd.DataFrame({a[0]: v[i] for a, v, i in zip(axes, values, idx)})
+        out[lo:lo + len(flat)] = model.predict_proba(featurize(raw))
+    out.flush()
+    del out
+
+    with open(path + ".json", "w") as f:
+        json.dump({
+            "axes": [list(a) for a in axes],
+            "classes": model.classes_.tolist(),
+            "model_sha256": model_sha256,
+        }, f)
+    return LookupTable.load(path)
+
+
+def load_lookup_tables(model_paths: dict, lookup_dir: str) -> dict:
+    """Load tables from lookup_dir whose recorded model hash matches the current model (or its source pickle)."""
+    tables = {}
+    if not os.path.isdir(lookup_dir):
+        return tables
+    for name, model_path in model_paths.items():
+        path = os.path.join(lookup_dir, name)
+        if not os.path.exists(path + ".npy"):
+            continue
+        try:
+            table = LookupTable.load(path)
+            if table.model_sha256 != model_sha256(model_path):
+                print(f"Warning: lookup table {path} is stale for {model_path}, ignoring")
+                continue
+            tables[name] = table
+            print(f"Loaded lookup table: {path} {table.shape}")
+        except Exception as e:
+            print(f"Warning: failed loading lookup table {path}: {e}")
+    return tables
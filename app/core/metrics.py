@@ -0,0 +1,265 @@
+# app/core/metrics.py
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+
+# per-stage timing, Server-Timing headers and /metrics; when off, stage() is a shared no-op
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# stage name -> seconds for the request being handled (None outside an instrumented request)
+_timings: ContextVar = ContextVar("playcaller_timings", default=None)
+
+
+class _Histogram:
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            base = ",".join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            sep = "," if base else ""
+            for bound, c in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {c}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+class _Counter:
+    def __init__(self, name: str, help_text: str, label_names: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series = {}
+
+    def inc(self, labels: tuple, value: float = 1):
+        self._series[labels] = self._series.get(labels, 0) + value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._series.items()):
+            base = ",".join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+class Metrics:
+    """Process-local Prometheus registry for request, stage and model latencies."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = _Counter("playcaller_requests_total", "Requests handled", ("endpoint", "status"))
+        self.request_seconds = _Histogram("playcaller_request_seconds", "End-to-end request latency", ("endpoint",))
+        self.stage_seconds = _Histogram("playcaller_stage_seconds", "Latency per request stage", ("endpoint", "stage"))
+        self.model_seconds = _Histogram("playcaller_model_inference_seconds", "Inference latency per model", ("endpoint", "model"))
+        self.extra = []
+
+    def observe_request(self, endpoint: str, status: int, total: float, stages: dict, models: dict):
+        with self._lock:
+            self.requests.inc((endpoint, str(status)))
+            self.request_seconds.observe((endpoint,), total)
+            for name, seconds in stages.items():
+                self.stage_seconds.observe((endpoint, name), seconds)
+            for name, seconds in models.items():
+                self.model_seconds.observe((endpoint, name), seconds)
+
+    def add_collector(self, collect):
+        """collect() returns extra exposition lines (gauges owned by other subsystems)."""
+        self.extra.append(collect)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.request_seconds, self.stage_seconds, self.model_seconds):
+                lines.extend(metric.render())
+        for collect in self.extra:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# ---------- hot-path helpers ----------
+class _Stage:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings: dict, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + elapsed
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str):
+    """`with stage("inference"): ...` adds the block's wall time to the current request's timings."""
+    timings = _timings.get()
+    if timings is None:
+        return _NO_STAGE
+    return _Stage(timings, name)
+
+
+def record_model(name: str, seconds: float):
+    timings = _timings.get()
+    if timings is not None:
+        timings.setdefault("_models", {})[name] = seconds
+
+
+@contextmanager
+def message_timings(endpoint: str):
+    """
+    Per-message timings for long-lived connections (WebSocket sessions), recorded
+    under `endpoint` like a request. Set timings["_status"] to record a failure.
+    """
+    if not METRICS_ENABLED:
+        yield {}
+        return
+    start = time.perf_counter()
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    except BaseException:
+        timings["_status"] = 500
+        raise
+    finally:
+        _timings.reset(token)
+        stages = {k: v for k, v in timings.items() if not k.startswith("_")}
+        stages["total"] = time.perf_counter() - start
+        metrics.observe_request(
+            endpoint, timings.get("_status", 200), stages["total"], stages, timings.get("_models", {})
+        )
+
+
+class InstrumentedRoute(APIRoute):
+    """APIRoute that marks when the endpoint starts and finishes, after FastAPI's validation and before serialization."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if METRICS_ENABLED:
+            endpoint = _instrument(endpoint, path)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _instrument(endpoint, path: str):
+    # include_router() re-creates routes with the prefixed path; re-wrap the original endpoint
+    if getattr(endpoint, "_instrumented", False):
+        endpoint = endpoint.__wrapped__
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        timings = _timings.get()
+        if timings is None:
+            return await endpoint(*args, **kwargs)
+        timings["_endpoint_path"] = path
+        timings["_handler_start"] = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timings["_handler_end"] = time.perf_counter()
+
+    wrapper._instrumented = True
+    return wrapper
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: starts per-request timings, derives the validation and
+    serialization stages from the handler marks, adds a Server-Timing header and
+    records everything into `metrics`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        timings = {}
+        token = _timings.set(timings)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                stages = _derive_stages(timings, start)
+                if stages:
+                    header = ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in stages.items())
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+                timings["_stages"] = stages
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            route = scope.get("route")
+            endpoint = timings.get("_endpoint_path") or (getattr(route, "path", None) if route is not None else None)
+            if endpoint is not None:
+                # unmatched paths are not recorded, so scanners can't blow up label cardinality
+                metrics.observe_request(
+                    endpoint,
+                    status[0],
+                    time.perf_counter() - start,
+                    timings.get("_stages") or {},
+                    timings.get("_models", {}),
+                )
+
+
+def _derive_stages(timings: dict, start: float) -> dict:
+    stages = {k: v for k, v in timings.items() if not k.startswith("_")}
+    handler_start = timings.get("_handler_start")
+    if handler_start is not None:
+        # routing, body parsing and Pydantic validation happen before the endpoint call, as do
+        # the auth and admission dependencies (timed as their own stages)
+        stages["validation"] = max(handler_start - start - stages.get("auth", 0.0) - stages.get("admission", 0.0), 0.0)
+        handler_end = timings.get("_handler_end")
+        if handler_end is not None:
+            stages["serialization"] = time.perf_counter() - handler_end
+    stages["total"] = time.perf_counter() - start
+    return stages
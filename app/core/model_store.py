@@ -0,0 +1,268 @@
+# app/core/model_store.py
+import os
+import shutil
+import threading
+import time
+import warnings
+from collections.abc import Mapping
+from datetime import datetime
+
+import joblib
+
+from .forest import CompiledForest, CompactForest
+from .lookup import model_sha256
+
+# memory-map the array files of COMPILED_MODELS so every worker process shares one copy through the
+# OS page cache; sklearn pickles are unpickled into private memory in each process regardless
+MODEL_MMAP = os.environ.get("MODEL_MMAP", "1") == "1"
+WARMUP_ROUNDS = int(os.environ.get("MODEL_WARMUP_ROUNDS", "3"))
+
+# models are scored on float32 matrices in training column order (app.core.features); forests
+# pickled from DataFrames would otherwise warn about missing feature names on every call
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+
+def _rss_bytes():
+    # resident set size of this process (Linux only)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def model_version(path: str) -> str:
+    """Short content hash of a model file (a compact export shares its source pickle's, see model_sha256)."""
+    return model_sha256(path)[:12]
+
+
+def _file_state(path: str):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+class ModelStore(Mapping):
+    """
+    Versioned, lazily loaded models keyed by name (offense_model, def_pressure_model, ...).
+
+    Each model is loaded on first access and identified by a short content hash
+    of its pickle. refresh() looks for changed pickles, loads and warms up the
+    new version in a background thread, then swaps the (model, version) entry
+    in a single assignment, so requests never wait on a reload and never see a
+    half-loaded model. A model that fails to load is stored as None; a failed
+    reload keeps serving the previous version.
+
+    Models listed in `compiled` are served by CompiledForest. When mmap is on,
+    their node arrays are persisted once under array_dir (keyed by version) and
+    memory-mapped, so workers share pages instead of each holding a copy.
+    Paths ending in .npz are CompactForest exports and are loaded as they are.
+    """
+
+    def __init__(self, paths: dict, array_dir: str, compiled=(), mmap: bool = MODEL_MMAP, warmup: dict = None):
+        self.paths = dict(paths)
+        self.array_dir = array_dir
+        self.compiled = set(compiled)
+        self.mmap = mmap
+        self.warmup = warmup or {}
+        self.created_at = time.perf_counter()
+        self._entries = {}
+        self._file_states = {}
+        self._stats = {}
+        self._locks = {name: threading.Lock() for name in self.paths}
+        self._reload_lock = threading.Lock()
+        self._pending = set()
+        self._listeners = []
+        self._watcher = None
+
+    # Mapping interface used by the routers: models.get(name), models[name]
+    def __getitem__(self, name):
+        return self.entry(name)[0]
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def entry(self, name: str):
+        """(model, version) for name, loading it on first use. Read once so the pair is always consistent."""
+        if name not in self.paths:
+            raise KeyError(name)
+        entry = self._entries.get(name)
+        if entry is None:
+            with self._locks[name]:
+                if name not in self._entries:
+                    self._entries[name] = self._load(name)
+            entry = self._entries[name]
+        return entry
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._entries
+
+    def version(self, name: str):
+        """Active version of a loaded model, None if it is not loaded (yet)."""
+        entry = self._entries.get(name)
+        return entry[1] if entry is not None and entry[0] is not None else None
+
+    @property
+    def versions(self) -> dict:
+        return {name: self.version(name) for name in self.paths}
+
+    def is_compiled(self, name: str) -> bool:
+        return name in self.compiled or "all" in self.compiled
+
+    def load_file(self, name: str, path: str):
+        """(model, version) from another pickle of `name` (e.g. a team variant), loaded and warmed up like name itself."""
+        version = model_version(path)
+        return self._load_version(name, path, version), version
+
+    def add_listener(self, callback):
+        """callback(name, version) runs after a new version has been swapped in."""
+        self._listeners.append(callback)
+
+    # ---------- loading ----------
+    def _load(self, name: str):
+        path = self.paths[name]
+        start = time.perf_counter()
+        rss_before = _rss_bytes()
+        file_state = _file_state(path)
+        try:
+            version = model_version(path)
+            model = self._load_version(name, path, version)
+            print(f"Loaded model: {path} ({version})")
+        except Exception as e:
+            model, version = None, None
+            print(f"Warning: failed loading {path}: {e}")
+
+        rss_after = _rss_bytes()
+        self._file_states[name] = file_state
+        self._stats[name] = {
+            "loaded": model is not None,
+            "version": version,
+            "format": type(model).__name__ if model is not None else None,
+            "loaded_at": datetime.utcnow().isoformat(),
+            "load_seconds": round(time.perf_counter() - start, 4),
+            "seconds_after_startup": round(time.perf_counter() - self.created_at, 4),
+            "resident_bytes_delta": None if rss_before is None or rss_after is None else rss_after - rss_before,
+            "mapped_bytes": model.nbytes if self.mmap and isinstance(model, CompiledForest) else 0,
+            "reloads": 0,
+            "last_error": None,
+        }
+        return model, version
+
+    def _load_version(self, name: str, path: str, version: str):
+        if path.endswith(".npz"):
+            # already array-backed and small; compilation and mmap don't apply
+            model = CompactForest.load(path)
+        elif self.is_compiled(name):
+            model = self._load_compiled(name, path, version)
+        else:
+            model = joblib.load(path, mmap_mode="r" if self.mmap else None)
+        self._warm_up(name, model)
+        return model
+
+    def _load_compiled(self, name: str, path: str, version: str) -> CompiledForest:
+        if not self.mmap:
+            return CompiledForest.from_sklearn(joblib.load(path))
+
+        target = os.path.join(self.array_dir, f"{name}-{version}")
+        if not os.path.exists(os.path.join(target, "meta.json")):
+            # first worker to get here converts the pickle; write to a temp dir and rename so others never see a partial model
+            tmp = f"{target}.tmp-{os.getpid()}"
+            CompiledForest.from_sklearn(joblib.load(path)).save(tmp)
+            try:
+                os.rename(tmp, target)
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)
+        return CompiledForest.load(target, mmap_mode="r")
+
+    def _warm_up(self, name: str, model):
+        # score a representative row before serving: surfaces broken pickles and faults in mmapped pages
+        sample = self.warmup.get(name)
+        if sample is None:
+            return
+        for _ in range(WARMUP_ROUNDS):
+            model.predict_proba(sample)
+
+    # ---------- hot reload ----------
+    def refresh(self, background: bool = True) -> list:
+        """
+        Check every loaded model's pickle and reload the ones whose content changed.
+        Returns the names being reloaded.
+        """
+        changed = []
+        with self._reload_lock:
+            for name, path in self.paths.items():
+                if name not in self._entries or name in self._pending:
+                    continue
+                if _file_state(path) == self._file_states.get(name):
+                    continue
+                self._pending.add(name)
+                changed.append(name)
+
+        for name in changed:
+            if background:
+                threading.Thread(target=self._reload, args=(name,), name=f"reload-{name}", daemon=True).start()
+            else:
+                self._reload(name)
+        return changed
+
+    def _reload(self, name: str):
+        path = self.paths[name]
+        stats = self._stats.setdefault(name, {"reloads": 0})
+        try:
+            file_state = _file_state(path)
+            version = model_version(path)
+            if version == self.version(name):
+                # touched but identical content
+                self._file_states[name] = file_state
+                return
+
+            start = time.perf_counter()
+            model = self._load_version(name, path, version)
+
+            self._entries[name] = (model, version)  # atomic swap
+            self._file_states[name] = file_state
+            stats.update({
+                "loaded": True,
+                "version": version,
+                "format": type(model).__name__,
+                "loaded_at": datetime.utcnow().isoformat(),
+                "load_seconds": round(time.perf_counter() - start, 4),
+                "mapped_bytes": model.nbytes if self.mmap and isinstance(model, CompiledForest) else 0,
+                "reloads": stats.get("reloads", 0) + 1,
+                "last_error": None,
+            })
+            print(f"Reloaded model: {path} ({version})")
+            for callback in self._listeners:
+                callback(name, version)
+        except Exception as e:
+            stats["last_error"] = str(e)
+            print(f"Warning: failed reloading {path}, keeping version {self.version(name)}: {e}")
+        finally:
+            self._pending.discard(name)
+
+    def start_watcher(self, interval: float):
+        """Poll the model files every `interval` seconds and hot-reload changes."""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh(background=False)
+                except Exception as e:
+                    print(f"Warning: model watcher error: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stats(self) -> dict:
+        return {
+            name: dict(self._stats.get(name, {"loaded": False, "version": None}), reloading=name in self._pending)
+            for name in self.paths
+        }
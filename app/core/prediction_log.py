@@ -0,0 +1,109 @@
+# app/core/prediction_log.py
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from .. import db_models
+from ..database import SessionLocal
+
+# history of served recommendations (prediction_log table); 0 disables
+PREDICTION_LOG = os.environ.get("PREDICTION_LOG", "1") == "1"
+# rows per bulk INSERT; this many queued requests also trigger an early flush
+PREDICTION_LOG_BATCH = int(os.environ.get("PREDICTION_LOG_BATCH", "500"))
+PREDICTION_LOG_INTERVAL = float(os.environ.get("PREDICTION_LOG_INTERVAL", "1.0"))  # seconds between flushes
+# queued requests beyond this are dropped (and counted) rather than growing memory without bound
+PREDICTION_LOG_MAX_QUEUE = int(os.environ.get("PREDICTION_LOG_MAX_QUEUE", "100000"))
+
+
+def _jsonable(value):
+    return value.model_dump() if hasattr(value, "model_dump") else value
+
+
+class PredictionLogWriter:
+    """
+    Write-behind log of served recommendations. log() is a deque append on the
+    request path; a background thread serializes the queued requests and writes
+    them with bulk INSERTs of about PREDICTION_LOG_BATCH rows, as soon as that
+    many requests are queued or PREDICTION_LOG_INTERVAL passes. close() drains
+    the queue.
+    """
+
+    def __init__(self, session_factory=SessionLocal, batch_size: int = PREDICTION_LOG_BATCH,
+                 interval: float = PREDICTION_LOG_INTERVAL, max_queue: int = PREDICTION_LOG_MAX_QUEUE):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_queue = max_queue
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._closing = False
+        self.stats = {"queued": 0, "written": 0, "flushes": 0, "dropped": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+
+    def log(self, endpoint: str, username, user_id, team_id, payloads: list, responses: list):
+        """
+        Queue one request's recommendations (payloads[i] was answered with responses[i]).
+        user_id / team_id must be verified ids (they are foreign keys), None otherwise.
+        """
+        if self._closing or len(self._queue) >= self.max_queue:
+            self.stats["dropped"] += len(payloads)
+            return
+        self._queue.append((time.time(), endpoint, username, user_id, team_id, payloads, responses))
+        self.stats["queued"] += len(payloads)
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self._flush()
+            if self._closing and not self._queue:
+                return
+
+    def _rows(self) -> list:
+        rows = []
+        while self._queue and len(rows) < self.batch_size:
+            created, endpoint, username, user_id, team_id, payloads, responses = self._queue.popleft()
+            created_at = datetime.utcfromtimestamp(created)
+            for payload, response in zip(payloads, responses):
+                rows.append({
+                    "created_at": created_at,
+                    "endpoint": endpoint,
+                    "username": username,
+                    "user_id": user_id,
+                    "team_id": team_id,
+                    "request": json.dumps(_jsonable(payload)),
+                    "response": json.dumps(response),
+                })
+        return rows
+
+    def _flush(self):
+        while self._queue:
+            rows = self._rows()
+            try:
+                with self.session_factory() as db:
+                    db.execute(insert(db_models.PredictionLog), rows)
+                    db.commit()
+                self.stats["written"] += len(rows)
+                self.stats["flushes"] += 1
+            except Exception as e:
+                # the history is best effort; a failing database must not back up the serving path
+                self.stats["errors"] += 1
+                self.stats["dropped"] += len(rows)
+                print(f"Warning: prediction log flush of {len(rows)} rows failed: {e}")
+
+    def close(self, timeout: float = 10.0):
+        """Stop accepting rows, write everything still queued and stop the writer thread."""
+        self._closing = True
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, pending=len(self._queue), batch_size=self.batch_size, interval_seconds=self.interval)
@@ -1,29 +1,61 @@
 # app/core/security.py
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from dataclasses import dataclass
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event
 from typing import Optional
+import asyncio
 import os
+import threading
+import time
 
 from .. import db_models
-from ..database import get_db
+from ..database import SessionLocal
 
 SECRET_KEY = os.environ.get("JWT_SECRET", "change-this-secret-in-prod")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# token subject -> user snapshot, so requests with a known token skip the users query (0 disables)
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", "60"))  # seconds
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", "10000"))
+
+# bcrypt (~100 ms per call) runs on its own bounded pool, never on the event loop or request threads
+BCRYPT_WORKERS = int(os.environ.get("BCRYPT_WORKERS", "2"))
+BCRYPT_MAX_PENDING = int(os.environ.get("BCRYPT_MAX_PENDING", "64"))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_slots = threading.BoundedSemaphore(BCRYPT_MAX_PENDING)
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def _run_bcrypt(fn, *args):
+    # reject instead of queueing without bound when a login storm outpaces the pool
+    if not _bcrypt_slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Too many concurrent logins", headers={"Retry-After": "1"})
+    try:
+        return await asyncio.wrap_future(_bcrypt_pool.submit(fn, *args))
+    finally:
+        _bcrypt_slots.release()
+
+async def hash_password_async(password: str) -> str:
+    return await _run_bcrypt(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_bcrypt(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_minutes: Optional[int] = ACCESS_TOKEN_EXPIRE_MINUTES):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
@@ -37,15 +69,96 @@ def decode_access_token(token: str):
     except JWTError:
         return None
 
-# dependency that returns the current user (db model)
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+@dataclass(frozen=True)
+class UserIdentity:
+    """Detached snapshot of a User row; safe to cache and share between requests."""
+    id: int
+    username: str
+    email: str
+    full_name: Optional[str]
+    is_active: bool
+    is_admin: bool
+
+    @classmethod
+    def from_user(cls, user: db_models.User) -> "UserIdentity":
+        return cls(user.id, user.username, user.email, user.full_name, user.is_active, user.is_admin)
+
+class IdentityCache:
+    """
+    LRU cache with a TTL of UserIdentity keyed on the token subject. Changes to
+    a user drop its entry in this process; the TTL bounds staleness elsewhere.
+    """
+
+    def __init__(self, maxsize: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, subject: str) -> Optional[UserIdentity]:
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return None
+        with self._lock:
+            item = self._entries.get(subject)
+            if item is None or item[0] < time.monotonic():
+                self._entries.pop(subject, None)
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(subject)
+            self._stats["hits"] += 1
+            return item[1]
+
+    def put(self, subject: str, identity: UserIdentity):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl, identity)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Drop the entries of one user (by id, so renames are covered), or everything."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                for subject in [k for k, (_, identity) in self._entries.items() if identity.id == user_id]:
+                    del self._entries[subject]
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, size=len(self._entries), maxsize=self.maxsize, ttl_seconds=self.ttl)
+
+identity_cache = IdentityCache()
+
+@event.listens_for(db_models.User, "after_update")
+@event.listens_for(db_models.User, "after_delete")
+def _invalidate_identity(mapper, connection, target):
+    identity_cache.invalidate(target.id)
+
+def _load_identity(username: str) -> Optional[UserIdentity]:
+    db = SessionLocal()
+    try:
+        user = db.query(db_models.User).filter(db_models.User.username == username).first()
+        return UserIdentity.from_user(user) if user else None
+    finally:
+        db.close()
+
+# dependency that returns the current user (cached identity snapshot)
+def get_current_user(token: str = Depends(oauth2_scheme)) -> UserIdentity:
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication credentials")
     username = payload.get("sub")
     if username is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-    user = db.query(db_models.User).filter(db_models.User.username == username).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    user = identity_cache.get(username)
+    if user is None:
+        user = _load_identity(username)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        identity_cache.put(username, user)
     return user
@@ -0,0 +1,283 @@
+# app/core/team_models.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from .. import db_models
+from ..database import SessionLocal
+from .model_store import ModelStore, _file_state
+from .security import decode_access_token, identity_cache, _load_identity
+
+# resident team models are evicted least recently used first beyond this many MB of model files
+TEAM_MODEL_MEMORY_MB = float(os.environ.get("TEAM_MODEL_MEMORY_MB", "512"))
+TEAM_MODELS_SCAN_INTERVAL = float(os.environ.get("TEAM_MODELS_SCAN_INTERVAL", "30"))  # seconds
+# (user, team) membership answers are cached this long, for at most this many pairs
+TEAM_MEMBERSHIP_TTL = float(os.environ.get("TEAM_MEMBERSHIP_TTL", "60"))  # seconds
+TEAM_MEMBERSHIP_CACHE_SIZE = int(os.environ.get("TEAM_MEMBERSHIP_CACHE_SIZE", "10000"))
+
+
+class MembershipCache:
+    """LRU cache with a TTL of membership answers keyed on (user id, team id)."""
+
+    def __init__(self, maxsize: int = TEAM_MEMBERSHIP_CACHE_SIZE, ttl: float = TEAM_MEMBERSHIP_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (user id, team id) -> (expires, is member)
+
+    def get(self, key: tuple):
+        """Cached answer, None when absent or expired."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] < time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def put(self, key: tuple, member: bool):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, member)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+membership_cache = MembershipCache()
+
+
+def _bearer_identity(request):
+    """UserIdentity of the request's bearer token, None without a valid one (blocking on a cache miss)."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    payload = decode_access_token(token) if scheme.lower() == "bearer" and token else None
+    username = payload.get("sub") if payload else None
+    if username is None:
+        return None
+    user = identity_cache.get(username)
+    if user is None:
+        user = _load_identity(username)
+        if user is not None:
+            identity_cache.put(username, user)
+    return user if user is not None and user.is_active else None
+
+
+def _is_member(user_id: int, team: int) -> bool:
+    cached = membership_cache.get((user_id, team))
+    if cached is not None:
+        return cached
+    with SessionLocal() as db:
+        member = db.query(db_models.TeamMember.id).filter(
+            db_models.TeamMember.team_id == team, db_models.TeamMember.user_id == user_id
+        ).first() is not None
+    membership_cache.put((user_id, team), member)
+    return member
+
+
+def _verify_team(request, team: int):
+    user = _bearer_identity(request)
+    if user is None or not _is_member(user.id, team):
+        raise HTTPException(status_code=403, detail=f"Team {team} models require a signed-in member of team {team}")
+    return user
+
+
+async def verified_team(request):
+    """
+    Team id (str) whose variants this caller may use, None without x-team-id.
+    The header only selects a team: the caller's bearer token must belong to a
+    member of it (team_members), otherwise 403. Resolved once per request (once
+    per live session) and kept on request.state with the verified user.
+    """
+    if hasattr(request.state, "team"):
+        return request.state.team
+    team = request.headers.get("x-team-id")
+    user = None
+    if team is not None:
+        if not team.isdigit():
+            raise HTTPException(status_code=400, detail="x-team-id must be an integer team id")
+        user = await run_in_threadpool(_verify_team, request, int(team))
+    request.state.team = team
+    request.state.team_user = user
+    return team
+
+
+def resolved_team(request):
+    """Team already verified for this request by verified_team, else None."""
+    return getattr(request.state, "team", None)
+
+
+def is_team_version(version) -> bool:
+    return isinstance(version, str) and version.startswith("team")
+
+
+class TeamModels:
+    """
+    Team-specific variants of the global models, loaded on demand.
+
+    Which teams have which variants comes from a directory scan, repeated every
+    TEAM_MODELS_SCAN_INTERVAL seconds on a background thread (a variant whose
+    file changed is dropped and loaded again on next use). A variant that fails
+    to load is served by the global model until its file changes. Loaded variants are kept in an LRU bounded
+    by `memory_bytes`, measured as the size of their model files. A team
+    without a variant of a model is served the global one. Which team a caller
+    belongs to is checked by verified_team. Versions are
+    "team<id>-<content hash>", so responses show which variant answered.
+    """
+
+    def __init__(self, store: ModelStore, root: str, memory_bytes: float = TEAM_MODEL_MEMORY_MB * 1e6,
+                 scan_interval: float = TEAM_MODELS_SCAN_INTERVAL):
+        self.store = store
+        self.root = root
+        self.memory_bytes = memory_bytes
+        self.scan_interval = scan_interval
+        self.file_names = {name: os.path.basename(path) for name, path in store.paths.items()}
+        self._variants = {}  # (team, name) -> (path, file state)
+        self._failed = {}  # (team, name) -> file state that failed to load
+        self._resident = OrderedDict()  # (team, name) -> (model, version, nbytes)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._watcher = None
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0, "fallbacks": 0, "failures": 0, "load_seconds": 0.0}
+        self._scan()
+
+    # ---------- discovery ----------
+    def _scan(self):
+        variants = {}
+        if os.path.isdir(self.root):
+            for team in os.listdir(self.root):
+                if not team.isdigit():
+                    continue
+                for name, file_name in self.file_names.items():
+                    path = os.path.join(self.root, team, file_name)
+                    state = _file_state(path)
+                    if state is not None:
+                        variants[(team, name)] = (path, state)
+        with self._lock:
+            for key, (model, version, nbytes) in list(self._resident.items()):
+                if variants.get(key, (None, None))[1] != self._variants.get(key, (None, None))[1]:
+                    # retrained or removed: the next request loads the new file (or falls back)
+                    del self._resident[key]
+            self._failed = {key: state for key, state in self._failed.items()
+                            if variants.get(key, (None, None))[1] == state}
+            self._variants = variants
+
+    def start_watcher(self):
+        """Rescan the directory every scan_interval seconds, off the event loop."""
+        if self._watcher is not None or self.scan_interval <= 0:
+            return
+
+        def watch():
+            while True:
+                time.sleep(self.scan_interval)
+                try:
+                    self._scan()
+                except Exception as e:
+                    print(f"Warning: team model scan error: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="team-model-scan", daemon=True)
+        self._watcher.start()
+
+    def has_variant(self, team: str, name: str) -> bool:
+        """Whether the team has its own usable `name`; False means the global model serves it (counted as a fallback)."""
+        variant = self._variants.get((team, name))
+        if variant is not None and self._failed.get((team, name)) != variant[1]:
+            return True
+        self.stats["fallbacks"] += 1
+        return False
+
+    # ---------- resident set ----------
+    def resident(self, team: str, name: str):
+        """(model, version) if the variant is loaded (counted as a hit), else None."""
+        with self._lock:
+            item = self._resident.get((team, name))
+            if item is None:
+                return None
+            self._resident.move_to_end((team, name))
+            self.stats["hits"] += 1
+            return item[0], item[1]
+
+    def load(self, team: str, name: str):
+        """Load a variant (blocking; call off the event loop). None if it can't be loaded."""
+        key = (team, name)
+        with self._lock:
+            lock = self._load_locks.setdefault(key, threading.Lock())
+        with lock:
+            # another request may have loaded it while we waited
+            entry = self.resident(team, name)
+            if entry is not None:
+                return entry
+            variant = self._variants.get(key)
+            if variant is None or self._failed.get(key) == variant[1]:
+                return None
+            path, state = variant
+            start = time.perf_counter()
+            try:
+                model, version = self.store.load_file(name, path)
+                nbytes = os.path.getsize(path)
+            except Exception as e:
+                # not retried until the file changes (next scan)
+                with self._lock:
+                    self._failed[key] = state
+                self.stats["failures"] += 1
+                print(f"Warning: failed loading team {team} variant {path}: {e}")
+                return None
+            version = f"team{team}-{version}"
+            with self._lock:
+                self._resident[key] = (model, version, nbytes)
+                self.stats["loads"] += 1
+                self.stats["load_seconds"] += time.perf_counter() - start
+                self._evict(keep=key)
+            print(f"Loaded team model: {path} ({version})")
+            return model, version
+
+    def _evict(self, keep):
+        total = sum(nbytes for _, _, nbytes in self._resident.values())
+        while total > self.memory_bytes and len(self._resident) > 1:
+            key = next(iter(self._resident))
+            if key == keep:
+                self._resident.move_to_end(key)
+                continue
+            total -= self._resident.pop(key)[2]
+            self.stats["evictions"] += 1
+
+    def version(self, team: str, name: str):
+        """Version of a resident variant, None otherwise (no LRU touch)."""
+        item = self._resident.get((team, name))
+        return item[1] if item is not None else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            resident = {f"{team}/{name}": {"version": version, "bytes": nbytes}
+                        for (team, name), (_, version, nbytes) in self._resident.items()}
+            return dict(
+                self.stats,
+                load_seconds=round(self.stats["load_seconds"], 4),
+                variants=len(self._variants),
+                failed=sorted(f"{team}/{name}" for team, name in self._failed),
+                resident=resident,
+                resident_bytes=sum(item["bytes"] for item in resident.values()),
+                memory_bytes=int(self.memory_bytes),
+            )
+
+    def collect(self) -> list:
+        stats = self.snapshot()
+        lines = [
+            "# HELP playcaller_team_models_resident Team model variants currently loaded",
+            "# TYPE playcaller_team_models_resident gauge",
+            f"playcaller_team_models_resident {len(stats['resident'])}",
+            "# HELP playcaller_team_models_resident_bytes Model file bytes of the loaded team variants",
+            "# TYPE playcaller_team_models_resident_bytes gauge",
+            f"playcaller_team_models_resident_bytes {stats['resident_bytes']}",
+        ]
+        for key in ("loads", "evictions", "hits", "fallbacks", "failures"):
+            lines += [
+                f"# HELP playcaller_team_models_{key}_total Team model {key}",
+                f"# TYPE playcaller_team_models_{key}_total counter",
+                f"playcaller_team_models_{key}_total {stats[key]}",
+            ]
+        return lines
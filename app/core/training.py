@@ -0,0 +1,440 @@
+# app/core/training.py
+"""Helpers shared by the offline training scripts."""
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from .lookup import file_sha256
+from .model_store import _rss_bytes
+
+
+class StageReport:
+    """
+    Wall-clock time and peak resident memory per named pipeline stage.
+
+    RSS is sampled from a background thread while a stage runs, so memory
+    held by native code (tree building, parquet readers) is counted too.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start_rss = _rss_bytes() or 0
+        peak = [start_rss]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(self.interval):
+                peak[0] = max(peak[0], _rss_bytes() or 0)
+
+        sampler = threading.Thread(target=sample, name=f"rss-{name}", daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            done.set()
+            sampler.join()
+            peak_rss = max(peak[0], _rss_bytes() or 0)
+            self.stages.append({
+                "stage": name,
+                "seconds": round(seconds, 3),
+                "peak_rss_mb": round(peak_rss / 1e6, 1),
+                "delta_rss_mb": round((peak_rss - start_rss) / 1e6, 1),
+            })
+            print(f"[{name}] {seconds:.2f}s, peak RSS {peak_rss / 1e6:.0f} MB (+{(peak_rss - start_rss) / 1e6:.0f} MB)")
+
+    def summary(self):
+        print(f"\n{'stage':14s} {'seconds':>9s} {'peak MB':>9s} {'+MB':>7s}")
+        for s in self.stages:
+            print(f"{s['stage']:14s} {s['seconds']:9.2f} {s['peak_rss_mb']:9.0f} {s['delta_rss_mb']:7.0f}")
+        print(f"{'total':14s} {sum(s['seconds'] for s in self.stages):9.2f}")
+
+
+def cached_ingest(source: str, cache_dir: str, version: str, read_chunks) -> str:
+    """
+    Path of a parquet copy of `source` holding only what training needs.
+
+    The cache file is keyed by the source's sha256 and `version` (bump it when
+    the projection or filters change). On a miss, read_chunks(source) yields
+    already filtered DataFrames which are streamed into the file, so memory
+    is bounded by one chunk regardless of the source size.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    stem = os.path.splitext(os.path.basename(source))[0].replace(" ", "_")
+    path = os.path.join(cache_dir, f"{stem}-{version}-{file_sha256(source)[:16]}.parquet")
+    if os.path.exists(path):
+        print(f"Using cached ingest: {path}")
+        return path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = path + ".tmp"
+    writer = None
+    rows = 0
+    try:
+        for chunk in read_chunks(source):
+            if chunk.empty:
+                continue
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError(f"no rows ingested from {source}")
+    os.replace(tmp, path)
+    print(f"Ingested {rows} rows from {source} into {path}")
+    return path
+
+
+# ---------- latency-aware hyperparameter search ----------
+def _grid(grid: dict) -> list:
+    return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+
+def _fit_fold(params: dict, X, y, train_idx, test_idx, keep: bool):
+    from sklearn.ensemble import RandomForestClassifier
+
+    model = RandomForestClassifier(**params, n_jobs=1)
+    model.fit(X[train_idx], y[train_idx])
+    return model.score(X[test_idx], y[test_idx]), model if keep else None
+
+
+def serving_cost(model, X, single_rows: int = 200, batch_rows: int = 1000) -> dict:
+    """Latency (single row p50/p99, one batch), pickled size and load time of a fitted model, as the API serves it."""
+    import io
+
+    import joblib
+    import numpy as np
+
+    model.n_jobs = None
+    X = np.ascontiguousarray(X[:max(single_rows, batch_rows)], dtype=np.float32)
+    model.predict_proba(X[:1])  # warm-up
+    single = []
+    for i in range(single_rows):
+        start = time.perf_counter()
+        model.predict_proba(X[i % len(X):i % len(X) + 1])
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    model.predict_proba(X[:batch_rows])
+    batch = time.perf_counter() - start
+
+    buf = io.BytesIO()
+    joblib.dump(model, buf)
+    size = buf.tell()
+    buf.seek(0)
+    start = time.perf_counter()
+    joblib.load(buf)
+    load = time.perf_counter() - start
+    return {
+        "p50_ms": round(float(np.percentile(single, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(single, 99)) * 1000, 3),
+        "batch_ms": round(batch * 1000, 3),
+        "batch_rows": min(batch_rows, len(X)),
+        "size_mb": round(size / 1e6, 2),
+        "load_ms": round(load * 1000, 1),
+    }
+
+
+def search_forests(X, y, grid: dict, base_params: dict, cv: int = 3, max_rows: int = 200_000, n_jobs: int = -1) -> list:
+    """
+    Cross-validated accuracy plus serving cost for every RandomForestClassifier
+    configuration in `grid` (a param -> values mapping, combined with base_params).
+
+    All (candidate, fold) fits run in parallel threads with one core each;
+    serving cost is then measured one candidate at a time on its first-fold
+    model, so the timings are not skewed by concurrent training.
+    """
+    import numpy as np
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import StratifiedKFold
+
+    if len(X) > max_rows:
+        keep = np.sort(np.random.default_rng(42).choice(len(X), max_rows, replace=False))
+        X, y = X[keep], y[keep]
+    folds = list(StratifiedKFold(n_splits=cv, shuffle=True, random_state=42).split(X, y))
+    candidates = [dict(base_params, **params) for params in _grid(grid)]
+
+    fits = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_fit_fold)(params, X, y, train_idx, test_idx, i == 0)
+        for params in candidates
+        for i, (train_idx, test_idx) in enumerate(folds)
+    )
+
+    results = []
+    for c, params in enumerate(candidates):
+        scores = [score for score, _ in fits[c * cv:(c + 1) * cv]]
+        model = fits[c * cv][1]
+        results.append(dict(
+            params={k: params[k] for k in grid},
+            cv_accuracy=round(float(np.mean(scores)), 4),
+            cv_std=round(float(np.std(scores)), 4),
+            **serving_cost(model, X[folds[0][1]]),
+        ))
+        fits[c * cv] = None  # free the model before measuring the next one
+    return results
+
+
+def pareto_front(results: list, cost: str = "p99_ms") -> list:
+    """Candidates no other candidate beats on both accuracy and `cost`, cheapest first."""
+    front = []
+    for r in sorted(results, key=lambda r: (r[cost], -r["cv_accuracy"])):
+        if not front or r["cv_accuracy"] > front[-1]["cv_accuracy"]:
+            front.append(r)
+    return front
+
+
+def pick_within_budget(results: list, latency_budget_ms: float, cost: str = "p99_ms") -> dict:
+    """Most accurate candidate whose single-row latency fits the budget (the fastest one if none does)."""
+    fitting = [r for r in results if r[cost] <= latency_budget_ms]
+    if not fitting:
+        fastest = min(results, key=lambda r: r[cost])
+        print(f"Warning: no candidate fits {latency_budget_ms} ms; using the fastest ({fastest[cost]} ms)")
+        return fastest
+    return max(fitting, key=lambda r: (r["cv_accuracy"], -r[cost]))
+
+
+def print_search(name: str, results: list, front: list, best: dict):
+    print(f"\n{name}: {len(results)} candidates, Pareto front (accuracy vs single-row p99):")
+    print(f"{'params':36s} {'cv acc':>7s} {'p50 ms':>7s} {'p99 ms':>7s} {'batch ms':>9s} {'MB':>7s} {'load ms':>8s}")
+    for r in front:
+        params = ", ".join(f"{k}={v}" for k, v in r["params"].items())
+        mark = " <- selected" if r is best else ""
+        print(f"{params:36s} {r['cv_accuracy']:7.4f} {r['p50_ms']:7.2f} {r['p99_ms']:7.2f} "
+              f"{r['batch_ms']:9.1f} {r['size_mb']:7.1f} {r['load_ms']:8.1f}{mark}")
+    if best not in front:
+        print(f"selected (off the front): {best['params']}")
+
+
+def write_search_report(path: str, name: str, results: list, front: list, best: dict, latency_budget_ms: float):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "model": name,
+            "latency_budget_ms": latency_budget_ms,
+            "selected": best,
+            "pareto_front": front,
+            "candidates": results,
+        }, f, indent=2)
+    print(f"Search results written to {path}")
+
+
+def latency_search(name: str, X, y, grid: dict, base_params: dict, latency_budget_ms: float,
+                   report_dir: str = os.path.join("data", "search")) -> dict:
+    """Run search_forests, print and save the Pareto front, and return the selected grid params."""
+    results = search_forests(X, y, grid, base_params)
+    front = pareto_front(results)
+    best = pick_within_budget(results, latency_budget_ms)
+    print_search(name, results, front, best)
+    write_search_report(os.path.join(report_dir, f"{name}.json"), name, results, front, best, latency_budget_ms)
+    return best["params"]
+
+
+def training_arguments(description: str):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--search", action="store_true",
+                        help="cross-validate the search grid and train the most accurate forest that fits the latency budget")
+    parser.add_argument("--latency-budget-ms", type=float, default=float(os.environ.get("LATENCY_BUDGET_MS", "5")),
+                        help="single-row p99 predict_proba budget for --search (default 5 ms)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="grow the saved forests with trees fitted on games not in the matrix cache yet")
+    parser.add_argument("--new-trees", type=int, default=int(os.environ.get("INCREMENTAL_TREES", "50")),
+                        help="trees added per model by --incremental (default 50)")
+    parser.add_argument("--no-prune", action="store_true",
+                        help="keep subtrees whose leaves agree in the compact (.npz) export")
+    parser.add_argument("--max-trees", type=int, default=int(os.environ.get("MAX_TREES", "500")),
+                        help="cap on trees per model; the oldest trees are dropped beyond it (default 500)")
+    parser.add_argument("--history-rows", type=int, default=int(os.environ.get("HISTORY_ROWS", "100000")),
+                        help="cached rows --incremental samples: training rows are replayed when trees are dropped, "
+                             "held-out rows scored (default 100000)")
+    return parser.parse_args()
+
+
+# ---------- incremental retraining ----------
+class MatrixCache:
+    """
+    Engineered training arrays (features, labels, game ids, held-out mask) as .npy parts under
+    one directory, memory-mapped when read. A full retrain rewrites it; an
+    incremental retrain appends one part holding only the new games, so the
+    history is never parsed or featurized again: its game ids tell which games
+    are new, and samples of its rows are replayed and evaluated by grow_forest.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def parts(self) -> list:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            os.path.join(self.path, d) for d in os.listdir(self.path) if d.startswith("part-") and "." not in d
+        )
+
+    def load(self, name: str):
+        """One array across all parts (a read-only memory map when there is a single part)."""
+        import numpy as np
+
+        arrays = [np.load(os.path.join(part, f"{name}.npy"), mmap_mode="r") for part in self.parts()]
+        if not arrays:
+            raise FileNotFoundError(f"matrix cache {self.path} is empty; run a full training first")
+        return arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+
+    def games(self):
+        return self.load("games")
+
+    def sample(self, names: list, rows: int, seed: int = 42) -> dict:
+        """Up to `rows` random rows of each named array, gathered part by part from the memory maps."""
+        import numpy as np
+
+        parts = self.parts()
+        if not parts:
+            raise FileNotFoundError(f"matrix cache {self.path} is empty; run a full training first")
+        sizes = [len(np.load(os.path.join(part, "games.npy"), mmap_mode="r")) for part in parts]
+        bounds = np.cumsum([0] + sizes)
+        pick = np.sort(np.random.default_rng(seed).choice(bounds[-1], min(rows, bounds[-1]), replace=False))
+        out = {name: [] for name in names}
+        for part, lo, hi in zip(parts, bounds[:-1], bounds[1:]):
+            idx = pick[(pick >= lo) & (pick < hi)] - lo
+            for name in names:
+                path = os.path.join(part, f"{name}.npy")
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"matrix cache {self.path} has no {name!r} arrays; run a full training first")
+                out[name].append(np.load(path, mmap_mode="r")[idx])
+        return {name: np.concatenate(arrays) for name, arrays in out.items()}
+
+    def append(self, arrays: dict) -> str:
+        """Write arrays ({name: array}, equal lengths) as a new part; returns its path."""
+        import numpy as np
+
+        target = os.path.join(self.path, f"part-{len(self.parts()):05d}")
+        tmp = f"{target}.tmp-{os.getpid()}"
+        os.makedirs(tmp, exist_ok=True)
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            if array.dtype == object:
+                # fixed-width strings can be memory-mapped, pickled objects can't
+                array = array.astype(str)
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array))
+        os.rename(tmp, target)
+        return target
+
+    def rebuild(self, arrays: dict) -> str:
+        shutil.rmtree(self.path, ignore_errors=True)
+        return self.append(arrays)
+
+
+def read_new_games(path: str, game_column: str, known, columns: list):
+    """Rows of a parquet file whose game is not in `known`, filtered while reading."""
+    import pandas as pd
+
+    known = list(dict.fromkeys(known.tolist()))
+    filters = [(game_column, "not in", known)] if known else None
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+def grow_forest(path: str, X, y, new_trees: int, max_trees: int, n_jobs: int = -1, X_test=None, y_test=None,
+                prune: bool = True, X_history=None, y_history=None, test_history=None) -> str:
+    """
+    Add `new_trees` trees fitted on (X, y) to the forest pickled at `path`
+    with warm_start; beyond `max_trees` the oldest trees are dropped, so the
+    forest is a sliding window over the seasons. The result replaces the
+    pickle atomically, which the API's reload watcher picks up as a new
+    version; the compact export is refreshed with it. Returns the version.
+
+    (X_history, y_history) is a sample of previously trained games (see
+    MatrixCache.sample) and test_history marks the rows earlier runs held
+    out. Those are scored before and after, to show what the update costs on
+    the history. When trees are dropped, the new trees are also fitted on the
+    other (training) rows, so the games only the dropped trees had seen stay
+    represented.
+    """
+    import joblib
+    import numpy as np
+
+    model = joblib.load(path)
+    classes = np.unique(y)
+    if not np.array_equal(classes, model.classes_):
+        # new trees would index probabilities by a different class list than the old ones
+        raise ValueError(f"new games have classes {classes.tolist()}, the model {model.classes_.tolist()}; run a full retrain")
+
+    replay = check = None
+    if X_history is not None:
+        test_history = np.asarray(test_history, dtype=bool)
+        replay = (X_history[~test_history], y_history[~test_history]) if (~test_history).any() else None
+        check = (X_history[test_history], y_history[test_history]) if test_history.any() else None
+
+    before = model.score(X_test, y_test) if X_test is not None else None
+    history_before = model.score(*check) if check is not None else None
+    keep = max(0, min(len(model.estimators_), max_trees - new_trees))
+    dropped = len(model.estimators_) - keep
+    model.estimators_ = model.estimators_[dropped:]
+    model.set_params(warm_start=True, n_estimators=keep + new_trees, n_jobs=n_jobs)
+    if dropped and replay is not None:
+        model.fit(np.concatenate([X, replay[0]]), np.concatenate([y, replay[1]]))
+    else:
+        model.fit(X, y)
+    # saved like a fresh model: the next warm start sets these again, and serving is faster without joblib dispatch
+    model.set_params(warm_start=False, n_jobs=None)
+
+    tmp = path + ".tmp"
+    joblib.dump(model, tmp)
+    os.replace(tmp, path)
+    version = file_sha256(path)[:12]
+    export_compact(model, path, X if check is None else np.concatenate([X, check[0]]), prune=prune)
+    scores = "" if before is None else f", held-out accuracy {before:.3f} -> {model.score(X_test, y_test):.3f}"
+    if history_before is not None:
+        scores += f", history accuracy {history_before:.3f} -> {model.score(*check):.3f}"
+    replayed = f" (+{len(replay[0])} replayed history rows)" if dropped and replay is not None else ""
+    print(f"{os.path.basename(path)}: +{new_trees} trees{replayed}, -{dropped} oldest, {len(model.estimators_)} total"
+          f"{scores} (version {version})")
+    return version
+
+
+def holdout_games(games, test_size: float = 0.2):
+    """Boolean mask holding out about test_size of the games (whole games, so plays of one game don't leak across)."""
+    import numpy as np
+
+    unique = np.unique(games)
+    n_test = int(len(unique) * test_size)
+    if n_test == 0:
+        return None
+    return np.isin(games, np.random.default_rng(42).choice(unique, n_test, replace=False))
+
+
+def export_compact(model, pickle_path: str, X_check, prune: bool = True, check_rows: int = 10_000) -> str:
+    """
+    Write the CompactForest export of a just-saved pickle next to it
+    (<stem>.npz), after checking that it reproduces predict_proba exactly on
+    up to check_rows rows of X_check. Returns the export's path.
+    """
+    import numpy as np
+
+    from .forest import CompactForest
+
+    path = os.path.splitext(pickle_path)[0] + ".npz"
+    compact = CompactForest.from_sklearn(model, prune=prune, source_sha256=file_sha256(pickle_path))
+    X_check = np.ascontiguousarray(X_check[:check_rows], dtype=np.float32)
+    if not np.array_equal(compact.predict_proba(X_check), model.predict_proba(X_check)):
+        raise ValueError(f"compact export of {pickle_path} does not reproduce its predictions")
+
+    tmp = path + ".tmp"
+    compact.save(tmp)
+    os.replace(tmp, path)
+    print(f"Exported {path}: {os.path.getsize(path) / 1e6:.1f} MB (pickle {os.path.getsize(pickle_path) / 1e6:.1f} MB), "
+          f"{len(compact.feature)} nodes, {len(compact.distributions)} distinct leaf distributions")
+    return path
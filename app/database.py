@@ -1,6 +1,7 @@
 # app/database.py
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
@@ -9,8 +10,42 @@ load_dotenv()
 # Default to a local sqlite file if DATABASE_URL not provided
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./playcaller.db")
 
+_url = make_url(DATABASE_URL)
+IS_SQLITE = _url.get_backend_name() == "sqlite"
+# "sqlite://" and "sqlite:///:memory:" are in-memory databases (SQLAlchemy gives them a SingletonThreadPool)
+IS_MEMORY = IS_SQLITE and _url.database in (None, "", ":memory:")
+
+# connection pool: request threads, the auth cache and the prediction-log writer share it
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+
+# in-memory SQLite uses a single-connection pool that takes no sizing
+pool_args = {} if IS_MEMORY else {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+}
+
 # SQLAlchemy engine and session
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    pool_pre_ping=True,
+    **pool_args,
+)
+
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL: readers don't block the log writer and commits don't rewrite the main file;
+        # synchronous=NORMAL is durable across app crashes (only an OS crash can lose the last commits)
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
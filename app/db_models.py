@@ -37,4 +37,14 @@ class TeamMember(Base):
     user = relationship("User", back_populates="team_memberships")
     team = relationship("Team", back_populates="members")
 
+class PredictionLog(Base):
+    __tablename__ = "prediction_log"
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    endpoint = Column(String, nullable=False)
+    username = Column(String, index=True, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    team_id = Column(Integer, ForeignKey("teams.id"), index=True, nullable=True)
+    request = Column(Text, nullable=False)    # JSON game state
+    response = Column(Text, nullable=False)   # JSON recommendation as served (incl. model versions)
 
@@ -1,35 +1,80 @@
 # app/main.py
 import os
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-import joblib
+import time
 
 from .database import Base, engine
-from .routers import predictions
+from .routers import predictions, admin, live, auth
+from .core.lookup import load_lookup_tables
+from .core.model_store import ModelStore
+from .core.cache import PredictionCache
+from .core.coalescer import Coalescer, COALESCE_WINDOW_MS
+from .core.executor import InferenceExecutor, INFERENCE_PROCESSES
+from .core.model_store import MODEL_MMAP
+from .core.prediction_log import PredictionLogWriter, PREDICTION_LOG
+from .core.team_models import TeamModels
+from .core.metrics import MetricsMiddleware, METRICS_ENABLED, metrics as prometheus_metrics
+from .schemas import PlayInput, DefenseRequest
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# expected models are placed in repo root /models/
-OFFENSE_MODEL_PATH = os.path.join(BASE_DIR, "..", "models", "playcall_model.pkl")
-DEF_COVERAGE_PATH = os.path.join(BASE_DIR, "..", "models", "def_coverage_model.pkl")
-DEF_FRONT_PATH = os.path.join(BASE_DIR, "..", "models", "def_front_model.pkl")
-DEF_PRESSURE_PATH = os.path.join(BASE_DIR, "..", "models", "def_pressure_model.pkl")
+# expected models are placed in repo root /models/ (MODELS_DIR overrides, e.g. for benchmarks)
+MODELS_DIR = os.environ.get("MODELS_DIR", os.path.join(BASE_DIR, "..", "models"))
+# "compact" serves the .npz exports the training scripts write next to the pickles (app.core.forest.CompactForest)
+MODEL_FORMAT = os.environ.get("MODEL_FORMAT", "pickle")
+_MODEL_EXT = ".npz" if MODEL_FORMAT == "compact" else ".pkl"
+OFFENSE_MODEL_PATH = os.path.join(MODELS_DIR, "playcall_model" + _MODEL_EXT)
+DEF_COVERAGE_PATH = os.path.join(MODELS_DIR, "def_coverage_model" + _MODEL_EXT)
+DEF_FRONT_PATH = os.path.join(MODELS_DIR, "def_front_model" + _MODEL_EXT)
+DEF_PRESSURE_PATH = os.path.join(MODELS_DIR, "def_pressure_model" + _MODEL_EXT)
+
+MODEL_PATHS = {
+    "offense_model": OFFENSE_MODEL_PATH,
+    "def_coverage_model": DEF_COVERAGE_PATH,
+    "def_front_model": DEF_FRONT_PATH,
+    "def_pressure_model": DEF_PRESSURE_PATH,
+}
+
+# optional precomputed state-grid tables (see build_lookup_tables.py)
+LOOKUP_DIR = os.environ.get("LOOKUP_DIR", os.path.join(MODELS_DIR, "lookup"))
+
+# comma separated model names (or "all") served by the compiled array evaluator instead of sklearn
+COMPILED_MODELS = {
+    name.strip() for name in os.environ.get("COMPILED_MODELS", "").split(",") if name.strip()
+}
+
+# models are loaded on first use; set MODEL_PRELOAD=1 to load them all during startup instead
+MODEL_PRELOAD = os.environ.get("MODEL_PRELOAD", "0") == "1"
+MODEL_ARRAY_DIR = os.environ.get("MODEL_ARRAY_DIR", os.path.join(MODELS_DIR, "arrays"))
+
+# team-specific variants: <TEAM_MODELS_DIR>/<team id>/<same file name as the global model>
+TEAM_MODELS_DIR = os.environ.get("TEAM_MODELS_DIR", os.path.join(MODELS_DIR, "teams"))
+
+# seconds between checks for retrained pickles (0 disables; POST /admin/models/reload triggers a check)
+MODEL_RELOAD_INTERVAL = float(os.environ.get("MODEL_RELOAD_INTERVAL", "0"))
+
+# representative rows scored before a (new) model version starts serving
+_warmup_offense = predictions.build_offense_matrix([
+    PlayInput(down=1, ydstogo=10, yrdline100=75, qtr=1, ScoreDiff=0)
+])
+_warmup_defense = predictions.build_defense_matrix([
+    DefenseRequest(down=1, ydstogo=10, yardline_100=75, qtr=1, score_differential=0, quarter_seconds_remaining=900)
+])
+WARMUP_SAMPLES = {
+    "offense_model": _warmup_offense,
+    "def_coverage_model": _warmup_defense,
+    "def_front_model": _warmup_defense,
+    "def_pressure_model": _warmup_defense,
+}
 
 
 def load_models():
-    models = {}
-    for name, path in [
-        ("offense_model", OFFENSE_MODEL_PATH),
-        ("def_coverage_model", DEF_COVERAGE_PATH),
-        ("def_front_model", DEF_FRONT_PATH),
-        ("def_pressure_model", DEF_PRESSURE_PATH),
-    ]:
-        try:
-            models[name] = joblib.load(path)
-            print(f"Loaded model: {path}")
-        except Exception as e:
-            models[name] = None
-            print(f"Warning: failed loading {path}: {e}")
+    models = ModelStore(MODEL_PATHS, MODEL_ARRAY_DIR, compiled=COMPILED_MODELS, warmup=WARMUP_SAMPLES)
+    if MODEL_PRELOAD:
+        for name in models:
+            models.get(name)
     return models
 
 
@@ -44,6 +89,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 
 # create DB tables (if still needed)
 Base.metadata.create_all(bind=engine)
@@ -51,11 +99,46 @@ Base.metadata.create_all(bind=engine)
 
 @app.on_event("startup")
 def startup_event():
+    start = time.perf_counter()
     app.state.models = load_models()
+    app.state.lookup_tables = load_lookup_tables(MODEL_PATHS, LOOKUP_DIR)
+    app.state.team_models = TeamModels(app.state.models, TEAM_MODELS_DIR)
+    app.state.team_models.start_watcher()
+    if METRICS_ENABLED:
+        prometheus_metrics.add_collector(app.state.team_models.collect)
+    app.state.prediction_cache = PredictionCache()
+    app.state.coalescer = Coalescer() if COALESCE_WINDOW_MS > 0 else None
+    app.state.prediction_log = PredictionLogWriter() if PREDICTION_LOG else None
+    app.state.executor = None
+    if INFERENCE_PROCESSES > 0:
+        # each worker process holds its own models: sklearn pickles are copied into every worker,
+        # only models in COMPILED_MODELS (with MODEL_MMAP) share their pages
+        app.state.executor = InferenceExecutor(
+            MODEL_PATHS, MODEL_ARRAY_DIR, compiled=COMPILED_MODELS, mmap=MODEL_MMAP, warmup=WARMUP_SAMPLES
+        )
+        app.state.executor.start()
+    # drop cached predictions of the old version as soon as a reload swaps in a new one
+    app.state.models.add_listener(lambda name, version: app.state.prediction_cache.invalidate(name))
+    app.state.models.start_watcher(MODEL_RELOAD_INTERVAL)
+    app.state.startup_seconds = round(time.perf_counter() - start, 4)
+    print(f"Startup finished in {app.state.startup_seconds}s")
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    if app.state.executor is not None:
+        app.state.executor.shutdown()
+    if app.state.prediction_log is not None:
+        # write out everything still queued before the process exits
+        app.state.prediction_log.close()
 
 
 # ✅ ML-only routes
 app.include_router(predictions.router, prefix="/predictions", tags=["predictions"])
+app.include_router(live.router, prefix="/live", tags=["live"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
+# issues the bearer tokens that team variants (x-team-id) require
+app.include_router(auth.router, prefix="/auth", tags=["auth"])
 
 
 @app.get("/")
@@ -66,3 +149,22 @@ def root():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text exposition format
+    return prometheus_metrics.render()
+
+
+@app.get("/models")
+def models():
+    return {
+        name: {
+            "version": stats.get("version"),
+            "loaded": stats.get("loaded"),
+            "loaded_at": stats.get("loaded_at"),
+            "reloading": stats.get("reloading"),
+        }
+        for name, stats in app.state.models.stats().items()
+    }
+
+
@@ -0,0 +1,80 @@
+# app/routers/admin.py
+from fastapi import APIRouter, Depends, Request
+
+from app.core.guest import require_admin
+from app.core.security import identity_cache
+from app.core.admission import admission
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+# ---------- PREDICTION CACHE ----------
+@router.get("/cache")
+def cache_stats(request: Request):
+    return request.app.state.prediction_cache.stats()
+
+
+@router.delete("/cache")
+def clear_cache(request: Request, model: str | None = None):
+    request.app.state.prediction_cache.invalidate(model)
+    return {"status": "ok"}
+
+
+# ---------- REQUEST COALESCING ----------
+@router.get("/coalescer")
+def coalescer_stats(request: Request):
+    coalescer = request.app.state.coalescer
+    return coalescer.stats() if coalescer is not None else {"enabled": False}
+
+
+# ---------- INFERENCE EXECUTOR ----------
+@router.get("/executor")
+def executor_stats(request: Request):
+    executor = request.app.state.executor
+    return executor.snapshot() if executor is not None else {"enabled": False}
+
+
+# ---------- ADMISSION CONTROL ----------
+@router.get("/admission")
+def admission_stats():
+    return admission.snapshot() if admission is not None else {"enabled": False}
+
+
+# ---------- TEAM MODEL VARIANTS ----------
+@router.get("/team-models")
+def team_model_stats(request: Request):
+    return request.app.state.team_models.snapshot()
+
+
+# ---------- PREDICTION LOG ----------
+@router.get("/prediction-log")
+def prediction_log_stats(request: Request):
+    log = request.app.state.prediction_log
+    return log.snapshot() if log is not None else {"enabled": False}
+
+
+# ---------- AUTH IDENTITY CACHE ----------
+@router.get("/identities")
+def identity_stats():
+    return identity_cache.stats()
+
+
+@router.delete("/identities")
+def clear_identities():
+    identity_cache.invalidate()
+    return {"status": "ok"}
+
+
+# ---------- MODELS ----------
+@router.get("/models")
+def model_stats(request: Request):
+    return {
+        "startup_seconds": request.app.state.startup_seconds,
+        "models": request.app.state.models.stats(),
+    }
+
+
+@router.post("/models/reload")
+def reload_models(request: Request):
+    # loads, warms up and swaps in the background; poll /models for the active versions
+    return {"reloading": request.app.state.models.refresh()}
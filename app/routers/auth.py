@@ -1,39 +1,53 @@
 # app/routers/auth.py
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app import db_models
 from app.database import get_db
 from app.schemas import UserCreate, UserOut, Token
 from app.core.security import (
-    get_password_hash,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
     create_access_token,
     get_current_user,
+    UserIdentity,
 )
 
 router = APIRouter(tags=["auth"])
 
 
+def find_user(db: Session, username: str):
+    return (
+        db.query(db_models.User)
+        .filter(db_models.User.username == username)
+        .first()
+    )
+
+
+def add_user(db: Session, user: db_models.User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
 # ---------- SIGNUP ----------
 @router.post(
     "/signup",
     response_model=UserOut,
     status_code=status.HTTP_201_CREATED,
 )
-def signup(user_in: UserCreate, db: Session = Depends(get_db)):
-    existing = (
-        db.query(db_models.User)
-        .filter(db_models.User.username == user_in.username)
-        .first()
-    )
+async def signup(user_in: UserCreate, db: Session = Depends(get_db)):
+    # database calls run in the threadpool, bcrypt on its own pool; the event loop never blocks
+    existing = await run_in_threadpool(find_user, db, user_in.username)
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already exists",
         )
 
-    hashed = get_password_hash(user_in.password)
+    hashed = await hash_password_async(user_in.password)
 
     user = db_models.User(
         username=user_in.username,
@@ -43,10 +57,7 @@ def signup(user_in: UserCreate, db: Session = Depends(get_db)):
         is_admin=user_in.is_admin,
     )
 
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+    return await run_in_threadpool(add_user, db, user)
 
 
 # ---------- LOGIN ----------
@@ -55,18 +66,14 @@ def signup(user_in: UserCreate, db: Session = Depends(get_db)):
     response_model=Token,
     status_code=status.HTTP_200_OK,
 )
-def login(
+async def login(
     username: str,
     password: str,
     db: Session = Depends(get_db),
 ):
-    user = (
-        db.query(db_models.User)
-        .filter(db_models.User.username == username)
-        .first()
-    )
+    user = await run_in_threadpool(find_user, db, username)
 
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password_async(password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
@@ -88,5 +95,5 @@ def login(
     response_model=UserOut,
     status_code=status.HTTP_200_OK,
 )
-def me(current_user: db_models.User = Depends(get_current_user)):
+def me(current_user: UserIdentity = Depends(get_current_user)):
     return current_user
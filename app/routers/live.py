@@ -0,0 +1,132 @@
+# app/routers/live.py
+import asyncio
+import json
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from app.schemas import GameStateUpdate, PlayInput, DefenseRequest
+from app.core.guest import websocket_guest_or_user
+from app.core.metrics import METRICS_ENABLED, message_timings, metrics
+from .predictions import offense_prediction, defense_prediction, log_served, active_versions, DEFENSE_MODELS
+
+router = APIRouter()
+
+GAME_FIELDS = list(GameStateUpdate.model_fields)
+
+_sessions = {"active": 0, "opened": 0, "messages": 0}
+
+
+class GameSession:
+    """Game state of one live connection; every message updates part of it."""
+
+    def __init__(self, websocket: WebSocket, user: str):
+        self.websocket = websocket
+        self.user = user
+        self.state = {}
+        # side -> (payload, model versions, response); a delta that leaves a side's inputs
+        # alone (e.g. a clock tick for the offense) is answered without rescoring it
+        self.last = {}
+
+    def apply(self, update: GameStateUpdate):
+        self.state.update(update.model_dump(exclude_none=True))
+
+    def missing(self) -> list:
+        return [field for field in GAME_FIELDS if field not in self.state]
+
+    def offense_input(self) -> PlayInput:
+        s = self.state
+        return PlayInput(
+            down=s["down"], ydstogo=s["ydstogo"], yrdline100=s["yardline_100"], qtr=s["qtr"], ScoreDiff=s["score_differential"]
+        )
+
+    def defense_input(self) -> DefenseRequest:
+        return DefenseRequest(**self.state)
+
+    async def recommend(self, side: str, names: list, payload, predict) -> dict:
+        versions = active_versions(self.websocket, names)
+        last = self.last.get(side)
+        if last is not None and last[0] == payload and last[1] == versions and None not in versions:
+            return last[2]
+        response = await predict(self.websocket, payload)
+        self.last[side] = (payload, versions, response)
+        return response
+
+    async def handle(self, message: dict) -> dict:
+        self.apply(GameStateUpdate.model_validate(message))
+        missing = self.missing()
+        if missing:
+            return {"error": "Incomplete game state", "missing": missing}
+        offense, defense = await asyncio.gather(
+            self.recommend("offense", ["offense_model"], self.offense_input(), offense_prediction),
+            self.recommend("defense", DEFENSE_MODELS, self.defense_input(), defense_prediction),
+        )
+        state = dict(self.state)
+        log_served(self.websocket, self.user, [state], [{"offense": offense, "defense": defense}])
+        return {"state": state, "offense": offense, "defense": defense}
+
+
+# Live game session: the client sends state deltas, the server pushes both recommendations
+@router.websocket("/game")
+async def live_game(websocket: WebSocket):
+    """
+    One connection per game. Each client message is a JSON object with any of
+    the GameStateUpdate fields (plus an optional "id" echoed back); the first
+    one must carry the full state. Auth is checked once, at the handshake.
+    """
+    user = websocket_guest_or_user(websocket)
+    if user is None:
+        await websocket.close(code=1008, reason="Authentication required")
+        return
+    await websocket.accept()
+
+    session = GameSession(websocket, user)
+    _sessions["active"] += 1
+    _sessions["opened"] += 1
+    try:
+        while True:
+            text = await websocket.receive_text()
+            _sessions["messages"] += 1
+            message_id = None
+            with message_timings("/live/game") as timings:
+                try:
+                    message = json.loads(text)
+                    if not isinstance(message, dict):
+                        raise ValueError("expected a JSON object")
+                    message_id = message.pop("id", None)
+                    reply = await session.handle(message)
+                except ValidationError as e:
+                    timings["_status"] = 422
+                    reply = {"error": "Invalid game state", "detail": e.errors(include_url=False, include_context=False)}
+                except ValueError as e:
+                    timings["_status"] = 400
+                    reply = {"error": f"Invalid message: {e}"}
+                except HTTPException as e:
+                    # models unavailable; keep the session open so the client can retry
+                    timings["_status"] = e.status_code
+                    reply = {"error": e.detail}
+            if message_id is not None:
+                reply["id"] = message_id
+            await websocket.send_json(reply)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        _sessions["active"] -= 1
+
+
+def _collect() -> list:
+    return [
+        "# HELP playcaller_live_sessions Open live game sessions",
+        "# TYPE playcaller_live_sessions gauge",
+        f"playcaller_live_sessions {_sessions['active']}",
+        "# HELP playcaller_live_sessions_opened_total Live game sessions opened",
+        "# TYPE playcaller_live_sessions_opened_total counter",
+        f"playcaller_live_sessions_opened_total {_sessions['opened']}",
+        "# HELP playcaller_live_messages_total Live game state updates received",
+        "# TYPE playcaller_live_messages_total counter",
+        f"playcaller_live_messages_total {_sessions['messages']}",
+    ]
+
+
+if METRICS_ENABLED:
+    metrics.add_collector(_collect)
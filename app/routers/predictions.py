@@ -1,74 +1,322 @@
-# app/routers/predictions.py
-from fastapi import APIRouter, HTTPException, Depends, Request
-import pandas as pd
-from app.schemas import PlayInput, DefenseRequest
-from typing import Any
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import time
+import json
+from functools import partial
+from typing import Optional
+import numpy as np
+import pyarrow as pa
+from app.schemas import (
+    PlayInput, DefenseRequest, OffenseSweepRequest, DefenseSweepRequest,
+    SweepAxisValues, SweepGrid, OffenseSweepResponse, DefenseSweepResponse,
+)
+from typing import Any, List
 from app.core.guest import allow_guest_or_user
+from app.core.admission import admit
+from app.core.team_models import verified_team, resolved_team, is_team_version
+from app.core.cache import canonical_key
+from app.core.metrics import InstrumentedRoute, stage, record_model
+from app.core.anytime import anytime_single, n_trees
+from app.core.features import (
+    OFFENSE_INPUTS, DEFENSE_FEATURES, offense_matrix, defense_matrix, offense_features, defense_features, grid_columns,
+)
+from app.core.arrow_io import (
+    ARROW_STREAM, read_batches, column, prediction_fields, prediction_arrays, encode_schema, encode_batch, end_of_stream,
+)
 
 
-router = APIRouter()
+# every prediction route is rate-limited and admission-controlled (app.core.admission)
+router = APIRouter(route_class=InstrumentedRoute, dependencies=[Depends(admit)])
+
+# run the pressure/coverage/front forests concurrently (tree traversal releases the GIL)
+DEFENSE_PARALLEL = os.environ.get("DEFENSE_PARALLEL", "1") == "1"
+# only requests up to this many rows fan out; larger ones score the models in turn on their own
+# threadpool thread, so a sweep or Arrow upload never queues single plays behind it on the shared pool
+DEFENSE_PARALLEL_MAX_ROWS = int(os.environ.get("DEFENSE_PARALLEL_MAX_ROWS", "64"))
+_defense_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="defense") if DEFENSE_PARALLEL else None
+
+def build_offense_matrix(rows: List[PlayInput]) -> np.ndarray:
+    # engineering (same as training, see app.core.features)
+    with stage("features"):
+        return offense_matrix(rows)
+
+
+def build_defense_matrix(rows: List[DefenseRequest]) -> np.ndarray:
+    with stage("features"):
+        return defense_matrix(rows)
+
+
+def labels_from_proba(model: Any, probs) -> list:
+    # same rule RandomForestClassifier.predict uses, without a second pass over the trees
+    return model.classes_.take(probs.argmax(axis=1)).tolist()
+
+
+def predict_single(model: Any, X: np.ndarray):
+    """Label and probabilities for a one-row matrix from a single predict_proba."""
+    probs = model.predict_proba(X)
+    return labels_from_proba(model, probs)[0], probs[0].tolist()
+
+
+def lookup_single(request: Request, name: str, version, payload):
+    """Label and probabilities from a precomputed table, or None for out-of-grid states."""
+    table = getattr(request.app.state, "lookup_tables", {}).get(name)
+    if table is None or version is None or not table.model_sha256.startswith(version):
+        # no table, or it was built for a different model version
+        return None
+    probs = table.lookup(payload.model_dump())
+    if probs is None:
+        return None
+    return table.classes[probs.argmax()].item(), probs.tolist()
+
+
+def score_defense(models: list, X: np.ndarray, fn=predict_single) -> list:
+    """Apply fn(model, X) to each defensive model, concurrently when enabled and X is small."""
+    if _defense_pool is None or len(models) == 1 or len(X) > DEFENSE_PARALLEL_MAX_ROWS:
+        return [fn(m, X) for m in models]
+    futures = [_defense_pool.submit(fn, m, X) for m in models]
+    return [f.result() for f in futures]
+
+
+def predict_proba(model: Any, X: np.ndarray):
+    return model.predict_proba(X)
+
+
+async def model_entries(request: Request, names: list, detail: str) -> dict:
+    """
+    {name: (model, version)} read once per request, so a hot reload can't mix
+    versions mid-request. Members of a team sending x-team-id get their team's
+    variant of a model when there is one.
+    """
+    models = request.app.state.models
+    team_models = getattr(request.app.state, "team_models", None)
+    team = await verified_team(request) if team_models is not None else None
+    entries = {}
+    for name in names:
+        if team is not None and team_models.has_variant(team, name):
+            entry = team_models.resident(team, name) or await run_in_threadpool(team_models.load, team, name)
+            if entry is not None:
+                entries[name] = entry
+                continue
+        if models.is_loaded(name):
+            entries[name] = models.entry(name)
+        else:
+            # first use loads the model from disk; keep that off the event loop
+            entries[name] = await run_in_threadpool(models.entry, name)
+    if any(model is None for model, _ in entries.values()):
+        raise HTTPException(status_code=503, detail=detail)
+    return entries
+
+
+def active_versions(request: Request, names: list) -> tuple:
+    """Versions this caller would be served right now (team variant or global; None while not loaded)."""
+    models = request.app.state.models
+    team_models = getattr(request.app.state, "team_models", None)
+    team = resolved_team(request) if team_models is not None else None
+    return tuple(
+        (team_models.version(team, name) if team is not None else None) or models.version(name) for name in names
+    )
+
+
+async def score_live(request: Request, entries: dict, names: list, X: np.ndarray) -> list:
+    """(label, probabilities) per model for a one-row matrix, off the event loop."""
+    start = time.perf_counter()
+    with stage("inference"):
+        results = await _score_live(request, entries, names, X)
+    for name in names:
+        record_model(name, time.perf_counter() - start)
+    return results
+
+
+async def _score_live(request: Request, entries: dict, names: list, X: np.ndarray) -> list:
+    state = request.app.state
+    executor = getattr(state, "executor", None)
+    # worker processes only hold the global models; team variants are scored here
+    if executor is not None and not any(is_team_version(entries[name][1]) for name in names):
+        return await asyncio.gather(*(
+            executor.predict_single(name, entries[name][1], X) for name in names
+        ))
+    coalescer = getattr(state, "coalescer", None)
+    if coalescer is not None:
+        # scored together with concurrent requests for the same model
+        return await asyncio.gather(*(
+            asyncio.wrap_future(coalescer.submit(name, entries[name][0], X)) for name in names
+        ))
+    return await run_in_threadpool(score_defense, [entries[name][0] for name in names], X)
+
+
+async def score_batch(request: Request, entries: dict, names: list, X: np.ndarray) -> list:
+    """Probability matrix per model for a multi-row matrix, off the event loop."""
+    start = time.perf_counter()
+    with stage("inference"):
+        results = await _score_batch(request, entries, names, X)
+    for name in names:
+        record_model(name, time.perf_counter() - start)
+    return results
+
+
+async def _score_batch(request: Request, entries: dict, names: list, X: np.ndarray) -> list:
+    executor = getattr(request.app.state, "executor", None)
+    if executor is not None and not any(is_team_version(entries[name][1]) for name in names):
+        return await asyncio.gather(*(
+            executor.predict_proba(name, entries[name][1], X) for name in names
+        ))
+    return await run_in_threadpool(score_defense, [entries[name][0] for name in names], X, predict_proba)
+
+
+def cached_rows(request: Request, entries: dict, payload):
+    """(label, probabilities) per model from the lookup tables or the prediction cache, None where neither has it."""
+    cache = getattr(request.app.state, "prediction_cache", None)
+    key = canonical_key(payload) if cache is not None else None
+    with stage("cache"):
+        results = [lookup_single(request, name, version, payload) for name, (_, version) in entries.items()]
+        for i, (name, (_, version)) in enumerate(entries.items()):
+            if results[i] is None and cache is not None:
+                results[i] = cache.get(name, version, key)
+    return results, cache, key
+
+
+async def predict_rows(request: Request, entries: dict, payload, build_matrix) -> list:
+    """
+    (label, probabilities) per model for one payload: lookup table first, then
+    the prediction cache, then the live models for whatever is left.
+    """
+    results, cache, key = cached_rows(request, entries, payload)
+    names = list(entries)
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        # out-of-grid and uncached: fall back to the live models
+        X = build_matrix([payload])
+        live = await score_live(request, entries, [names[i] for i in missing], X)
+        for i, r in zip(missing, live):
+            results[i] = r
+            if cache is not None:
+                cache.put(names[i], entries[names[i]][1], key, r)
+    return results
+
+
+def request_deadline(latency_budget_ms: Optional[float]) -> Optional[float]:
+    return None if latency_budget_ms is None else time.perf_counter() + latency_budget_ms / 1000
+
+
+async def predict_rows_anytime(request: Request, entries: dict, payload, build_matrix, deadline: float) -> list:
+    """
+    (label, probabilities, trees evaluated) per model for one payload. Lookup and
+    cache hits are full-forest answers; the rest are evaluated tree chunk by tree
+    chunk until the vote settles or `deadline` passes. Partial votes are not cached.
+    """
+    cached, _, _ = cached_rows(request, entries, payload)
+    names = list(entries)
+    results = [None if r is None else (*r, n_trees(entries[name][0])) for name, r in zip(names, cached)]
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        X = build_matrix([payload])
+        start = time.perf_counter()
+        with stage("inference"):
+            live = await run_in_threadpool(
+                score_defense, [entries[names[i]][0] for i in missing], X, partial(anytime_single, deadline=deadline)
+            )
+        for i, r in zip(missing, live):
+            results[i] = r
+            record_model(names[i], time.perf_counter() - start)
+    return results
+
+
+async def predict_rows_budgeted(request: Request, entries: dict, payload, build_matrix, deadline) -> tuple:
+    """(results, trees evaluated per model or None); anytime evaluation only when the request set a budget."""
+    if deadline is None:
+        return await predict_rows(request, entries, payload, build_matrix), None
+    results = await predict_rows_anytime(request, entries, payload, build_matrix, deadline)
+    return [r[:2] for r in results], [r[2] for r in results]
+
+
+def log_served(request: Request, user, payloads: list, responses: list):
+    """Queue served recommendations for the history table (a deque append; written in bulk later)."""
+    log = getattr(request.app.state, "prediction_log", None)
+    if log is not None:
+        # only ids verified by verified_team: the header alone could name any (or no) team
+        team = resolved_team(request)
+        team_user = getattr(request.state, "team_user", None)
+        log.log(request.scope["path"], user, team_user.id if team_user is not None else None,
+                int(team) if team is not None else None, payloads, responses)
+
+
+async def offense_prediction(request: Request, data: PlayInput, deadline: float = None) -> dict:
+    """Response body of /offense; also used by the live game sessions."""
+    entries = await model_entries(request, ["offense_model"], "Offense model not available")
+
+    [(pred, probs)], trees = await predict_rows_budgeted(request, entries, data, build_offense_matrix, deadline)
+    response = {
+        "predicted_play": pred,
+        "probabilities": probs,
+        "model_version": entries["offense_model"][1],
+    }
+    if trees is not None:
+        response["trees_evaluated"] = trees[0]
+    return response
+
+
+# latency_budget_ms switches a single-play endpoint to anytime evaluation (see app.core.anytime)
+LATENCY_BUDGET_HELP = "Stop evaluating trees after this many milliseconds (or once the vote is settled)"
+
 
 # Offense endpoint
 @router.post("/offense")
-def predict_offense(data: PlayInput, request: Request, user=Depends(allow_guest_or_user)):
-    offense_model = request.app.state.models.get("offense_model")
-    if offense_model is None:
-        raise HTTPException(status_code=503, detail="Offense model not available")
-
-    df = pd.DataFrame([data.dict()])
-
-    # engineering (same as training)
-    df["red_zone"] = df["yrdline100"] <= 20
-    df["short_yard"] = df["ydstogo"] <= 2
-    df["third_long"] = (df["down"] == 3) & (df["ydstogo"] >= 8)
-    df["half"] = df["qtr"].apply(lambda x: 1 if x in [1, 2] else 0)
-
-    features = [
-        "down",
-        "ydstogo",
-        "qtr",
-        "yrdline100",
-        "red_zone",
-        "short_yard",
-        "third_long",
-        "half",
-        "ScoreDiff",
+async def predict_offense(data: PlayInput, request: Request, user=Depends(allow_guest_or_user),
+                          latency_budget_ms: Optional[float] = Query(None, gt=0, description=LATENCY_BUDGET_HELP)):
+    response = await offense_prediction(request, data, request_deadline(latency_budget_ms))
+    log_served(request, user, [data], [response])
+    return response
+
+
+# Offense batch endpoint: one predict_proba over all rows, results in input order
+@router.post("/offense/batch")
+async def predict_offense_batch(data: List[PlayInput], request: Request, user=Depends(allow_guest_or_user)):
+    entries = await model_entries(request, ["offense_model"], "Offense model not available")
+    offense_model, version = entries["offense_model"]
+    if not data:
+        return []
+
+    X = build_offense_matrix(data)
+
+    [probs] = await score_batch(request, entries, ["offense_model"], X)
+    preds = labels_from_proba(offense_model, probs)
+    response = [
+        {"predicted_play": pred, "probabilities": row, "model_version": version}
+        for pred, row in zip(preds, probs.tolist())
     ]
-    df = df[features]
+    log_served(request, user, data, response)
+    return response
 
-    pred = offense_model.predict(df)[0]
-    probs = offense_model.predict_proba(df)[0].tolist()
-    return {"predicted_play": pred, "probabilities": probs}
+DEFENSE_MODELS = ["def_pressure_model", "def_coverage_model", "def_front_model"]
 
-# Defensive combined endpoint (returns all three predictions)
-@router.post("/defense")
-def predict_defense(payload: DefenseRequest, request: Request,user=Depends(allow_guest_or_user)):
-    models = request.app.state.models
-    m_pressure = models.get("def_pressure_model")
-    m_coverage = models.get("def_coverage_model")
-    m_front = models.get("def_front_model")
-
-    if any(m is None for m in [m_pressure, m_coverage, m_front]):
-        raise HTTPException(status_code=503, detail="One or more defensive models not available")
-
-    X = pd.DataFrame([{
-        "down": payload.down,
-        "ydstogo": payload.ydstogo,
-        "yardline_100": payload.yardline_100,
-        "qtr": payload.qtr,
-        "score_differential": payload.score_differential,
-        "quarter_seconds_remaining": payload.quarter_seconds_remaining
-    }])
-
-    pressure_pred = int(m_pressure.predict(X)[0])
-    coverage_pred = m_coverage.predict(X)[0]
-    front_pred = m_front.predict(X)[0]
-
-    pressure_probs = m_pressure.predict_proba(X)[0].tolist()
-    coverage_probs = m_coverage.predict_proba(X)[0].tolist()
-    front_probs = m_front.predict_proba(X)[0].tolist()
 
+def defense_versions(entries: dict) -> dict:
     return {
+        "pressure": entries["def_pressure_model"][1],
+        "coverage": entries["def_coverage_model"][1],
+        "front": entries["def_front_model"][1],
+    }
+
+
+async def defense_prediction(request: Request, payload: DefenseRequest, deadline: float = None) -> dict:
+    """Response body of /defense; also used by the live game sessions."""
+    entries = await model_entries(request, DEFENSE_MODELS, "One or more defensive models not available")
+
+    results, trees = await predict_rows_budgeted(request, entries, payload, build_defense_matrix, deadline)
+    (
+        (pressure_pred, pressure_probs),
+        (coverage_pred, coverage_probs),
+        (front_pred, front_probs),
+    ) = results
+    pressure_pred = int(pressure_pred)
+
+    response = {
         "recommended_pressure": pressure_pred,
         "recommended_coverage": coverage_pred,
         "recommended_front": front_pred,
@@ -76,37 +324,275 @@ def predict_defense(payload: DefenseRequest, request: Request,user=Depends(allow
             "pressure": pressure_probs,
             "coverage": coverage_probs,
             "front": front_probs
-        }
+        },
+        "model_versions": defense_versions(entries),
     }
+    if trees is not None:
+        response["trees_evaluated"] = dict(zip(["pressure", "coverage", "front"], trees))
+    return response
+
+
+# Defensive combined endpoint (returns all three predictions)
+@router.post("/defense")
+async def predict_defense(payload: DefenseRequest, request: Request,user=Depends(allow_guest_or_user),
+                          latency_budget_ms: Optional[float] = Query(None, gt=0, description=LATENCY_BUDGET_HELP)):
+    response = await defense_prediction(request, payload, request_deadline(latency_budget_ms))
+    log_served(request, user, [payload], [response])
+    return response
+
+# Defensive batch endpoint: one predict_proba per model over all rows
+@router.post("/defense/batch")
+async def predict_defense_batch(payload: List[DefenseRequest], request: Request, user=Depends(allow_guest_or_user)):
+    entries = await model_entries(request, DEFENSE_MODELS, "One or more defensive models not available")
+    m_pressure, m_coverage, m_front = (entries[name][0] for name in DEFENSE_MODELS)
+    if not payload:
+        return []
+
+    X = build_defense_matrix(payload)
+
+    pressure_probs, coverage_probs, front_probs = await score_batch(request, entries, DEFENSE_MODELS, X)
+
+    pressure_preds = [int(p) for p in labels_from_proba(m_pressure, pressure_probs)]
+    coverage_preds = labels_from_proba(m_coverage, coverage_probs)
+    front_preds = labels_from_proba(m_front, front_probs)
+    versions = defense_versions(entries)
+
+    response = [
+        {
+            "recommended_pressure": pressure_preds[i],
+            "recommended_coverage": coverage_preds[i],
+            "recommended_front": front_preds[i],
+            "probabilities": {
+                "pressure": pp,
+                "coverage": cp,
+                "front": fp
+            },
+            "model_versions": versions,
+        }
+        for i, (pp, cp, fp) in enumerate(zip(
+            pressure_probs.tolist(), coverage_probs.tolist(), front_probs.tolist()
+        ))
+    ]
+    log_served(request, user, payload, response)
+    return response
 
 # Optional: individual defense endpoints
 @router.post("/defense/pressure")
-def predict_pressure(payload: DefenseRequest, request: Request, user=Depends(allow_guest_or_user)):
-    m = request.app.state.models.get("def_pressure_model")
-    if m is None:
-        raise HTTPException(status_code=503, detail="Pressure model not available")
-    X = pd.DataFrame([payload.dict()])
-    p = int(m.predict(X)[0])
-    probs = m.predict_proba(X)[0].tolist()
-    return {"recommended_pressure": p, "probabilities": probs}
+async def predict_pressure(payload: DefenseRequest, request: Request, user=Depends(allow_guest_or_user),
+                           latency_budget_ms: Optional[float] = Query(None, gt=0, description=LATENCY_BUDGET_HELP)):
+    deadline = request_deadline(latency_budget_ms)
+    entries = await model_entries(request, ["def_pressure_model"], "Pressure model not available")
+    [(p, probs)], trees = await predict_rows_budgeted(request, entries, payload, build_defense_matrix, deadline)
+    p = int(p)
+    response = {"recommended_pressure": p, "probabilities": probs, "model_version": entries["def_pressure_model"][1]}
+    if trees is not None:
+        response["trees_evaluated"] = trees[0]
+    log_served(request, user, [payload], [response])
+    return response
 
 @router.post("/defense/coverage")
-def predict_coverage(payload: DefenseRequest, request: Request, user=Depends(allow_guest_or_user)):
-    m = request.app.state.models.get("def_coverage_model")
-    if m is None:
-        raise HTTPException(status_code=503, detail="Coverage model not available")
-    X = pd.DataFrame([payload.dict()])
-    p = m.predict(X)[0]
-    probs = m.predict_proba(X)[0].tolist()
-    return {"recommended_coverage": p, "probabilities": probs}
+async def predict_coverage(payload: DefenseRequest, request: Request, user=Depends(allow_guest_or_user),
+                           latency_budget_ms: Optional[float] = Query(None, gt=0, description=LATENCY_BUDGET_HELP)):
+    deadline = request_deadline(latency_budget_ms)
+    entries = await model_entries(request, ["def_coverage_model"], "Coverage model not available")
+    [(p, probs)], trees = await predict_rows_budgeted(request, entries, payload, build_defense_matrix, deadline)
+    response = {"recommended_coverage": p, "probabilities": probs, "model_version": entries["def_coverage_model"][1]}
+    if trees is not None:
+        response["trees_evaluated"] = trees[0]
+    log_served(request, user, [payload], [response])
+    return response
 
 @router.post("/defense/front")
-def predict_front(payload: DefenseRequest, request: Request, user=Depends(allow_guest_or_user)):
-    m = request.app.state.models.get("def_front_model")
-    if m is None:
-        raise HTTPException(status_code=503, detail="Front model not available")
-    X = pd.DataFrame([payload.dict()])
-    p = m.predict(X)[0]
-    probs = m.predict_proba(X)[0].tolist()
-    return {"recommended_front": p, "probabilities": probs}
+async def predict_front(payload: DefenseRequest, request: Request, user=Depends(allow_guest_or_user),
+                        latency_budget_ms: Optional[float] = Query(None, gt=0, description=LATENCY_BUDGET_HELP)):
+    deadline = request_deadline(latency_budget_ms)
+    entries = await model_entries(request, ["def_front_model"], "Front model not available")
+    [(p, probs)], trees = await predict_rows_budgeted(request, entries, payload, build_defense_matrix, deadline)
+    response = {"recommended_front": p, "probabilities": probs, "model_version": entries["def_front_model"][1]}
+    if trees is not None:
+        response["trees_evaluated"] = trees[0]
+    log_served(request, user, [payload], [response])
+    return response
+
+
+# ---------- ARROW IPC / PARQUET BULK SCORING ----------
+def arrow_offense_matrix(batch: pa.RecordBatch) -> np.ndarray:
+    return offense_features(*(column(batch, name) for name in OFFENSE_INPUTS))
+
+
+def arrow_defense_matrix(batch: pa.RecordBatch) -> np.ndarray:
+    return defense_features(*(column(batch, name) for name in DEFENSE_FEATURES))
+
+
+async def stream_arrow(request: Request, entries: dict, names: list, columns: list, featurize, schema: pa.Schema, to_arrays):
+    """
+    Score an Arrow IPC / Parquet body record batch by record batch and stream the
+    results back as an Arrow IPC stream, rows in input order. Every batch is
+    decoded and featurized before the response starts, so a malformed batch
+    anywhere in the body is a 400 rather than a truncated stream.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+
+    def matrices():
+        with stage("features"):
+            return [featurize(batch) for batch in read_batches(body, content_type, columns)]
+
+    try:
+        pending = await run_in_threadpool(matrices)
+    except (pa.ArrowException, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid Arrow/Parquet body: {e}")
+
+    async def stream():
+        yield encode_schema(schema)
+        for X in pending:
+            probs = await score_batch(request, entries, names, X)
+            yield encode_batch(schema, to_arrays(probs))
+        yield end_of_stream()
+
+    return StreamingResponse(stream(), media_type=ARROW_STREAM)
+
+
+# Offense bulk endpoint: Arrow stream/file or Parquet with the PlayInput columns in, Arrow stream out
+@router.post("/offense/arrow")
+async def predict_offense_arrow(request: Request, user=Depends(allow_guest_or_user)):
+    entries = await model_entries(request, ["offense_model"], "Offense model not available")
+    offense_model, version = entries["offense_model"]
+    schema = pa.schema(
+        prediction_fields("predicted_play", pa.string(), "prob_", offense_model.classes_),
+        metadata={"model_version": version},
+    )
+
+    def to_arrays(probs):
+        [p] = probs
+        return prediction_arrays(offense_model, p, pa.string())
+
+    return await stream_arrow(request, entries, ["offense_model"], OFFENSE_INPUTS, arrow_offense_matrix, schema, to_arrays)
+
+
+# (label column, label type, probability column prefix) per defensive model
+DEFENSE_ARROW_OUTPUTS = [
+    ("recommended_pressure", pa.int64(), "pressure_prob_"),
+    ("recommended_coverage", pa.string(), "coverage_prob_"),
+    ("recommended_front", pa.string(), "front_prob_"),
+]
+
+
+# Defense bulk endpoint: Arrow stream/file or Parquet with the DefenseRequest columns in, Arrow stream out
+@router.post("/defense/arrow")
+async def predict_defense_arrow(request: Request, user=Depends(allow_guest_or_user)):
+    entries = await model_entries(request, DEFENSE_MODELS, "One or more defensive models not available")
+    models = [entries[name][0] for name in DEFENSE_MODELS]
+    fields = []
+    for model, (label, label_type, prefix) in zip(models, DEFENSE_ARROW_OUTPUTS):
+        fields += prediction_fields(label, label_type, prefix, model.classes_)
+    schema = pa.schema(fields, metadata={"model_versions": json.dumps(defense_versions(entries))})
+
+    def to_arrays(probs):
+        arrays = []
+        for model, p, (_, label_type, _) in zip(models, probs, DEFENSE_ARROW_OUTPUTS):
+            arrays += prediction_arrays(model, p, label_type)
+        return arrays
+
+    return await stream_arrow(request, entries, DEFENSE_MODELS, DEFENSE_FEATURES, arrow_defense_matrix, schema, to_arrays)
+
+
+# ---------- WHAT-IF GRID SWEEPS ----------
+SWEEP_MAX_AXES = 3
+# upper bound on grid points per sweep (rows scored in one predict_proba)
+SWEEP_MAX_POINTS = int(os.environ.get("SWEEP_MAX_POINTS", "100000"))
+
+
+def sweep_axes(axes: list, fields) -> list:
+    """[(field, values)] for the requested sweep axes; 422 for grids we won't score."""
+    if not 1 <= len(axes) <= SWEEP_MAX_AXES:
+        raise HTTPException(status_code=422, detail=f"A sweep needs 1 to {SWEEP_MAX_AXES} axes")
+    result = []
+    points = 1
+    for axis in axes:
+        if axis.field not in fields:
+            raise HTTPException(status_code=422, detail=f"Unknown sweep field {axis.field!r}")
+        if any(axis.field == field for field, _ in result):
+            raise HTTPException(status_code=422, detail=f"Field {axis.field!r} is swept twice")
+        if axis.step <= 0 or axis.stop < axis.start:
+            raise HTTPException(status_code=422, detail=f"Empty range for {axis.field!r}")
+        if fields[axis.field].annotation is int and not (float(axis.start).is_integer() and float(axis.step).is_integer()):
+            raise HTTPException(status_code=422, detail=f"{axis.field!r} takes whole numbers: use an integer start and step")
+        count = int(np.floor((axis.stop - axis.start) / axis.step + 1e-9)) + 1
+        points *= count
+        if points > SWEEP_MAX_POINTS:
+            raise HTTPException(status_code=422, detail=f"Sweep grid exceeds {SWEEP_MAX_POINTS} points")
+        values = axis.start + np.arange(count) * axis.step
+        if fields[axis.field].annotation is int:
+            values = values.astype(np.int64)
+        result.append((axis.field, values))
+    return result
+
+
+def sweep_grid(model, probs: np.ndarray, axes: list) -> SweepGrid:
+    """Class labels and a dense probability array shaped (*axis lengths, n_classes)."""
+    shape = tuple(len(values) for _, values in axes) + (probs.shape[1],)
+    # one tolist() per outer row: a single call over the whole grid holds the GIL long enough to stall the event loop
+    rows = [row.tolist() for row in probs.reshape(shape)]
+    return SweepGrid.model_construct(classes=model.classes_.tolist(), probabilities=rows)
+
+
+def sweep_axes_response(axes: list) -> list:
+    return [SweepAxisValues.model_construct(field=field, values=values.tolist()) for field, values in axes]
+
+
+def sweep_matrix(base: dict, axes: list, inputs: list, featurize) -> np.ndarray:
+    columns = grid_columns(base, axes)
+    return featurize(*(columns[name] for name in inputs))
+
+
+# the responses are built unvalidated (the grids come straight from predict_proba) and serialized by
+# pydantic's JSON encoder: jsonable_encoder and json.dumps are several times slower on grids this size
+def render_offense_sweep(model, probs: np.ndarray, axes: list, version) -> Response:
+    grid = sweep_grid(model, probs, axes)
+    return Response(OffenseSweepResponse.model_construct(
+        axes=sweep_axes_response(axes),
+        classes=grid.classes,
+        probabilities=grid.probabilities,
+        model_version=version,
+    ).model_dump_json(), media_type="application/json")
+
+
+def render_defense_sweep(entries: dict, probs: list, axes: list) -> Response:
+    grids = [sweep_grid(entries[name][0], p, axes) for name, p in zip(DEFENSE_MODELS, probs)]
+    return Response(DefenseSweepResponse.model_construct(
+        axes=sweep_axes_response(axes),
+        pressure=grids[0],
+        coverage=grids[1],
+        front=grids[2],
+        model_versions=defense_versions(entries),
+    ).model_dump_json(), media_type="application/json")
+
+
+# Offense what-if sweep: base PlayInput + 1-3 swept fields, one predict_proba over the whole grid.
+# Building the grid and rendering up to SWEEP_MAX_POINTS rows of JSON take seconds, so both run
+# in the threadpool rather than stalling the event loop.
+@router.post("/offense/sweep", response_model=OffenseSweepResponse)
+async def sweep_offense(payload: OffenseSweepRequest, request: Request, user=Depends(allow_guest_or_user)):
+    axes = sweep_axes(payload.axes, PlayInput.model_fields)
+    entries = await model_entries(request, ["offense_model"], "Offense model not available")
+    offense_model, version = entries["offense_model"]
+
+    with stage("features"):
+        X = await run_in_threadpool(sweep_matrix, payload.base.model_dump(), axes, OFFENSE_INPUTS, offense_features)
+
+    [probs] = await score_batch(request, entries, ["offense_model"], X)
+    return await run_in_threadpool(render_offense_sweep, offense_model, probs, axes, version)
+
+
+# Defense what-if sweep: base DefenseRequest + 1-3 swept fields, one predict_proba per model
+@router.post("/defense/sweep", response_model=DefenseSweepResponse)
+async def sweep_defense(payload: DefenseSweepRequest, request: Request, user=Depends(allow_guest_or_user)):
+    axes = sweep_axes(payload.axes, DefenseRequest.model_fields)
+    entries = await model_entries(request, DEFENSE_MODELS, "One or more defensive models not available")
+
+    with stage("features"):
+        X = await run_in_threadpool(sweep_matrix, payload.base.model_dump(), axes, DEFENSE_FEATURES, defense_features)
 
+    probs = await score_batch(request, entries, DEFENSE_MODELS, X)
+    return await run_in_threadpool(render_defense_sweep, entries, probs, axes)
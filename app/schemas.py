@@ -1,6 +1,6 @@
 # app/schemas.py
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, EmailStr
+from typing import List, Optional, Union
 
 # Auth
 class UserCreate(BaseModel):
@@ -41,9 +41,50 @@ class DefenseRequest(BaseModel):
     score_differential: int
     quarter_seconds_remaining: int
 
+# Live game session update: any subset of the game state (see /live/game)
+class GameStateUpdate(BaseModel):
+    model_config = ConfigDict(extra="forbid")
 
+    down: Optional[int] = None
+    ydstogo: Optional[int] = None
+    yardline_100: Optional[int] = None
+    qtr: Optional[int] = None
+    score_differential: Optional[int] = None
+    quarter_seconds_remaining: Optional[int] = None
 
+# What-if sweeps: a base state plus 1-3 fields swept over ranges (stop inclusive)
+class SweepAxis(BaseModel):
+    field: str
+    start: float
+    stop: float
+    step: float = 1
 
+class OffenseSweepRequest(BaseModel):
+    base: PlayInput
+    axes: List[SweepAxis]
 
+class DefenseSweepRequest(BaseModel):
+    base: DefenseRequest
+    axes: List[SweepAxis]
 
+# What-if sweep responses: probabilities are dense nested lists shaped [*axes, classes]
+class SweepAxisValues(BaseModel):
+    field: str
+    values: List[Union[int, float]]
 
+class SweepGrid(BaseModel):
+    classes: List[Union[int, str]]
+    probabilities: list
+
+class OffenseSweepResponse(BaseModel):
+    axes: List[SweepAxisValues]
+    classes: List[str]
+    probabilities: list
+    model_version: Optional[str] = None
+
+class DefenseSweepResponse(BaseModel):
+    axes: List[SweepAxisValues]
+    pressure: SweepGrid
+    coverage: SweepGrid
+    front: SweepGrid
+    model_versions: dict
@@ -0,0 +1,100 @@
+# benchmarks/forests.py
+"""
+Array forest evaluators against sklearn at single-row and bulk row counts.
+
+For each model and row count, times predict_proba of the sklearn forest and
+of every array evaluator built from it, and traces the evaluator's peak
+allocation. Exits non-zero when an evaluator's probabilities differ from
+sklearn's, when it is more than --max-slowdown times slower on bulk row
+counts, or when it allocates more than --max-memory-mb.
+
+usage:
+    python -m benchmarks.synthetic_models
+    python -m benchmarks.forests [--rows 1 100 10000 100000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+
+from app.core.features import offense_matrix_from_frame, defense_matrix_from_frame
+from app.core.forest import CompiledForest, CompactForest
+from benchmarks.workloads import game_states
+
+EVALUATORS = {
+    "compiled": CompiledForest.from_sklearn,
+    "compact": CompactForest.from_sklearn,
+}
+
+MODELS = {
+    "playcall_model": offense_matrix_from_frame,
+    "def_coverage_model": defense_matrix_from_frame,
+}
+
+# row counts from here up are held to --max-slowdown; below it per-call overhead dominates
+BULK_ROWS = 10_000
+
+
+def _timed(fn, X, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_mb(fn, X) -> float:
+    tracemalloc.start()
+    try:
+        fn(X)
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default=os.path.join("benchmarks", "models"), help="directory with the model pickles")
+    parser.add_argument("--rows", type=int, nargs="*", default=[1, 100, 10_000, 100_000])
+    parser.add_argument("--max-slowdown", type=float, default=3.0, help="allowed evaluator/sklearn time on bulk rows")
+    parser.add_argument("--max-memory-mb", type=float, default=256.0, help="allowed peak allocation per call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    states = game_states(max(args.rows), args.seed)
+    failures = []
+    print(f"{'model':<20}{'evaluator':<10}{'rows':>8}{'sklearn ms':>12}{'ms':>10}{'x':>7}{'peak MB':>9}")
+    for name, featurize in MODELS.items():
+        model = joblib.load(os.path.join(args.models, name + ".pkl"))
+        X_all = np.ascontiguousarray(featurize(states), dtype=np.float32)
+        for label, build in EVALUATORS.items():
+            forest = build(model)
+            for rows in args.rows:
+                X = X_all[:rows]
+                repeats = 20 if rows < BULK_ROWS else 1
+                reference = model.predict_proba(X)
+                exact = np.array_equal(forest.predict_proba(X), reference)
+                base = _timed(model.predict_proba, X, repeats)
+                took = _timed(forest.predict_proba, X, repeats)
+                peak = _peak_mb(forest.predict_proba, X)
+                print(f"{name:<20}{label:<10}{rows:>8}{base * 1000:>12.1f}{took * 1000:>10.1f}"
+                      f"{took / base:>7.2f}{peak:>9.1f}")
+                if not exact:
+                    failures.append(f"{name}/{label} @ {rows} rows: probabilities differ from sklearn")
+                if rows >= BULK_ROWS and took > args.max_slowdown * base:
+                    failures.append(f"{name}/{label} @ {rows} rows: {took / base:.1f}x sklearn")
+                if peak > args.max_memory_mb:
+                    failures.append(f"{name}/{label} @ {rows} rows: {peak:.0f} MB peak")
+
+    for failure in failures:
+        print("FAIL", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+# benchmarks/run.py
+"""
+In-process latency/throughput benchmark for every /predictions endpoint.
+
+Requests are driven straight through the ASGI interface of app.main:app (no
+sockets), so the numbers cover routing, validation, feature engineering,
+inference and serialization. Results are written as JSON; pass --compare with
+an earlier result to flag regressions. Server settings come from the usual
+environment variables (e.g. PREDICTION_CACHE_SIZE=0 measures the raw model path).
+
+usage:
+    python -m benchmarks.synthetic_models
+    python -m benchmarks.run [--requests 2000] [--concurrency 16] [--compare old.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+
+from benchmarks.workloads import game_states, offense_payloads, defense_payloads
+
+BATCH_ROWS = 100
+# rows per Arrow upload, written as record batches of ARROW_BATCH so responses stream several messages
+ARROW_ROWS = 10_000
+ARROW_BATCH = 2_500
+# swept fields per sweep request: field of length x distance, 99 * 25 grid points
+SWEEP_AXES = {
+    "offense": [{"field": "yrdline100", "start": 1, "stop": 99}, {"field": "ydstogo", "start": 1, "stop": 25}],
+    "defense": [{"field": "yardline_100", "start": 1, "stop": 99}, {"field": "ydstogo", "start": 1, "stop": 25}],
+}
+SWEEP_POINTS = 99 * 25
+
+ARROW_COLUMNS = {
+    "offense": ["down", "ydstogo", "yrdline100", "qtr", "ScoreDiff"],
+    "defense": ["down", "ydstogo", "yardline_100", "qtr", "score_differential", "quarter_seconds_remaining"],
+}
+
+SCENARIOS = [
+    # name, path, payload kind (offense|defense, optionally _arrow or _sweep), rows per request
+    ("offense", "/predictions/offense", "offense", 1),
+    ("offense_batch", "/predictions/offense/batch", "offense", BATCH_ROWS),
+    ("defense", "/predictions/defense", "defense", 1),
+    ("defense_batch", "/predictions/defense/batch", "defense", BATCH_ROWS),
+    ("defense_pressure", "/predictions/defense/pressure", "defense", 1),
+    ("defense_coverage", "/predictions/defense/coverage", "defense", 1),
+    ("defense_front", "/predictions/defense/front", "defense", 1),
+    ("offense_arrow", "/predictions/offense/arrow", "offense_arrow", ARROW_ROWS),
+    ("defense_arrow", "/predictions/defense/arrow", "defense_arrow", ARROW_ROWS),
+    ("offense_sweep", "/predictions/offense/sweep", "offense_sweep", SWEEP_POINTS),
+    ("defense_sweep", "/predictions/defense/sweep", "defense_sweep", SWEEP_POINTS),
+]
+
+CONTENT_TYPES = {"arrow": "application/vnd.apache.arrow.stream"}
+
+
+# ---------- minimal ASGI driver ----------
+async def asgi_post(app, path: str, body: bytes, content_type: str = "application/json") -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"bench"),
+            (b"content-type", content_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+            (b"x-guest", b"true"),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    done = asyncio.Event()
+    request_sent = False
+    status = 0
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body", False):
+            done.set()
+
+    await app(scope, receive, send)
+    return status
+
+
+class Lifespan:
+    """Drives the ASGI lifespan protocol so startup/shutdown handlers run as under uvicorn."""
+
+    def __init__(self, app):
+        self.app = app
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        self.task = None
+
+    async def _send(self, event: str):
+        await self.incoming.put({"type": f"lifespan.{event}"})
+        message = await self.outgoing.get()
+        if not message["type"].endswith("complete"):
+            raise RuntimeError(f"lifespan {event} failed: {message}")
+
+    async def startup(self):
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}}
+        self.task = asyncio.create_task(self.app(scope, self.incoming.get, self.outgoing.put))
+        await self._send("startup")
+
+    async def shutdown(self):
+        await self._send("shutdown")
+        await self.task
+
+
+# ---------- load driver ----------
+async def run_scenario(app, path: str, bodies: list, concurrency: int, warmup: int,
+                       content_type: str = "application/json") -> dict:
+    for body in bodies[:warmup]:
+        await asgi_post(app, path, body, content_type)
+
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(body):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            status = await asgi_post(app, path, body, content_type)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(b) for b in bodies))
+    wall = time.perf_counter() - start
+
+    ms = np.asarray(latencies) * 1000.0
+    return {
+        "requests": len(bodies),
+        "errors": errors,
+        "wall_seconds": round(wall, 4),
+        "rps": round(len(bodies) / wall, 2),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def arrow_stream(kind: str, rows: int, seed: int) -> bytes:
+    frame = game_states(rows, seed)[ARROW_COLUMNS[kind]]
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=ARROW_BATCH)
+    return sink.getvalue().to_pybytes()
+
+
+def make_bodies(kind: str, rows: int, requests: int, seed: int) -> list:
+    kind, _, body_format = kind.partition("_")
+    if body_format == "arrow":
+        return [arrow_stream(kind, rows, seed * 100_000 + i) for i in range(requests)]
+    make = offense_payloads if kind == "offense" else defense_payloads
+    if body_format == "sweep":
+        return [json.dumps({"base": base, "axes": SWEEP_AXES[kind]}).encode() for base in make(requests, seed)]
+    payloads = make(requests * rows, seed)
+    if rows == 1:
+        return [json.dumps(p).encode() for p in payloads]
+    return [json.dumps(payloads[i:i + rows]).encode() for i in range(0, len(payloads), rows)]
+
+
+async def run_all(args) -> dict:
+    from app.main import app
+    from app.core.admission import ADMISSION_BULK_CONCURRENCY
+
+    lifespan = Lifespan(app)
+    await lifespan.startup()
+    results = {}
+    for i, (name, path, kind, rows) in enumerate(SCENARIOS):
+        if args.only and name not in args.only:
+            continue
+        requests = args.requests if rows == 1 else max(args.requests // rows * 4, 20)
+        # Arrow uploads and sweeps are thousands of rows each: a couple of requests warm them up, and
+        # beyond the bulk admission slots extra concurrency only measures shedding
+        warmup = args.warmup if rows <= BATCH_ROWS else min(args.warmup, 2)
+        concurrency = args.concurrency if rows <= BATCH_ROWS else min(args.concurrency, ADMISSION_BULK_CONCURRENCY)
+        # a separate state stream per scenario, so one scenario doesn't warm the prediction cache for the next
+        bodies = make_bodies(kind, rows, requests + warmup, args.seed + i)
+        content_type = CONTENT_TYPES.get(kind.partition("_")[2], "application/json")
+        result = await run_scenario(app, path, bodies[warmup:], concurrency, warmup, content_type)
+        result.update({"endpoint": path, "rows_per_request": rows, "rows_per_s": round(result["rps"] * rows, 2)})
+        results[name] = result
+        print(f"{name:18s} p50 {result['p50_ms']:8.3f}ms  p95 {result['p95_ms']:8.3f}ms  "
+              f"p99 {result['p99_ms']:8.3f}ms  {result['rps']:9.1f} req/s  {result['rows_per_s']:10.1f} rows/s"
+              + (f"  errors {result['errors']}" if result["errors"] else ""))
+    await lifespan.shutdown()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Scenarios whose p99 latency or throughput got worse by more than `tolerance`."""
+    regressions = []
+    for name, now in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        if now["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {before['p99_ms']}ms -> {now['p99_ms']}ms")
+        if now["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {before['rps']} req/s -> {now['rps']} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default=os.path.join("benchmarks", "models"), help="directory with the four model pickles")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per single-row scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--out", help="result file (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown before flagging")
+    args = parser.parse_args()
+
+    # must be set before app.main is imported
+    os.environ.setdefault("MODELS_DIR", os.path.abspath(args.models))
+    os.environ.setdefault("MODEL_PRELOAD", "1")
+
+    results = asyncio.run(run_all(args))
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "env": {k: v for k, v in os.environ.items() if k in CONFIG_ENV},
+        },
+        "results": results,
+    }
+
+    out = args.out or os.path.join(
+        "benchmarks", "results", f"{datetime.utcnow():%Y%m%dT%H%M%S}-{commit or 'nogit'}.json"
+    )
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Results written to", out)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+
+
+# server settings that change performance; recorded with every result
+CONFIG_ENV = [
+    "MODELS_DIR", "MODEL_PRELOAD", "MODEL_MMAP", "COMPILED_MODELS", "DEFENSE_PARALLEL", "DEFENSE_PARALLEL_MAX_ROWS",
+    "PREDICTION_CACHE_SIZE", "PREDICTION_CACHE_TTL", "COALESCE_WINDOW_MS", "COALESCE_MAX_ROWS", "COALESCE_MAX_QUEUE",
+    "INFERENCE_PROCESSES", "INFERENCE_MAX_PENDING", "METRICS_ENABLED", "LOOKUP_DIR",
+    "ADMISSION_ENABLED", "ADMISSION_CONCURRENCY", "ADMISSION_BULK_CONCURRENCY", "ADMISSION_QUEUE", "RATE_LIMIT_RPS",
+]
+
+
+if __name__ == "__main__":
+    main()
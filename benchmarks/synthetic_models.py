@@ -0,0 +1,70 @@
+# benchmarks/synthetic_models.py
+"""
+Train stand-in forests with the same feature schema and hyperparameters as
+train_offense.py / train_defense.py, for machines that only have the Git LFS
+pointers in models/.
+
+usage: python -m benchmarks.synthetic_models [--out benchmarks/models] [--rows 50000]
+"""
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from app.core.features import offense_matrix_from_frame, defense_matrix_from_frame
+from benchmarks.workloads import game_states
+
+
+def _offense_labels(df, rng):
+    # pass more on long distance, late downs and when trailing
+    logit = 0.12 * (df["ydstogo"] - 6) + 0.5 * (df["down"] == 3) - 0.04 * df["ScoreDiff"]
+    p_pass = 1 / (1 + np.exp(-logit))
+    return np.where(rng.random(len(df)) < p_pass, "Pass", "Run")
+
+
+def _defense_labels(df, rng):
+    noise = rng.random(len(df))
+    pressure = ((df["down"] == 3) & (df["ydstogo"] >= 7) | (noise < 0.15)).astype(int)
+    coverage = np.where(
+        df["ydstogo"] >= 10, "Cover 3", np.where((df["down"] <= 2) & (noise < 0.5), "Base", "Cover 1")
+    )
+    front = np.where((df["yardline_100"] <= 10) | (df["ydstogo"] <= 2) | (noise < 0.3), "4-man", "3-man")
+    return {"def_pressure_model": pressure, "def_coverage_model": coverage, "def_front_model": front}
+
+
+def build(out_dir: str, rows: int = 50_000, seed: int = 42):
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    df = game_states(rows, seed)
+
+    start = time.perf_counter()
+    offense = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=seed, n_jobs=-1)
+    offense.fit(offense_matrix_from_frame(df), _offense_labels(df, rng))
+    offense.n_jobs = None  # as train_offense.py saves it
+    joblib.dump(offense, os.path.join(out_dir, "playcall_model.pkl"))
+    print(f"offense model: {time.perf_counter() - start:.1f}s")
+
+    X = defense_matrix_from_frame(df)
+    for name, y in _defense_labels(df, rng).items():
+        start = time.perf_counter()
+        model = RandomForestClassifier(
+            n_estimators=250, max_depth=12, min_samples_split=20, random_state=seed, n_jobs=-1
+        )
+        model.fit(X, y)
+        model.n_jobs = None  # as train_defense.py saves it
+        joblib.dump(model, os.path.join(out_dir, f"{name}.pkl"))
+        print(f"{name}: {time.perf_counter() - start:.1f}s")
+
+    print("Synthetic models written to", out_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=os.path.join("benchmarks", "models"))
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    build(args.out, args.rows, args.seed)
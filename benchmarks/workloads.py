@@ -0,0 +1,49 @@
+# benchmarks/workloads.py
+import numpy as np
+import pandas as pd
+
+# rough NFL situation mix: down shares, distance by down, field position, clock and score
+DOWN_P = [0.42, 0.32, 0.22, 0.04]
+QTR_P = [0.24, 0.26, 0.24, 0.25, 0.01]
+
+
+def game_states(n: int, seed: int = 0) -> pd.DataFrame:
+    """Raw game states with the union of PlayInput and DefenseRequest columns."""
+    rng = np.random.default_rng(seed)
+    down = rng.choice([1, 2, 3, 4], size=n, p=DOWN_P)
+    # 1st down is almost always 10 to go; later downs spread out, mostly short to medium
+    ydstogo = np.where(
+        down == 1,
+        np.where(rng.random(n) < 0.9, 10, rng.integers(1, 25, n)),
+        np.clip(rng.geometric(0.12, n), 1, 30),
+    )
+    yrdline100 = np.clip(rng.normal(55, 24, n).round(), 1, 99).astype(int)
+    ydstogo = np.minimum(ydstogo, yrdline100)
+    qtr = rng.choice([1, 2, 3, 4, 5], size=n, p=QTR_P)
+    score = np.clip(rng.normal(0, 9, n).round(), -35, 35).astype(int)
+    seconds = rng.integers(0, 901, n)
+    return pd.DataFrame({
+        "down": down,
+        "ydstogo": ydstogo,
+        "yrdline100": yrdline100,
+        "qtr": qtr,
+        "ScoreDiff": score.astype(float),
+        "yardline_100": yrdline100,
+        "score_differential": score,
+        "quarter_seconds_remaining": seconds,
+    })
+
+
+def offense_payloads(n: int, seed: int = 0) -> list:
+    df = game_states(n, seed)
+    cols = ["down", "ydstogo", "yrdline100", "qtr", "ScoreDiff"]
+    return [dict(zip(cols, row)) for row in df[cols].itertuples(index=False, name=None)]
+
+
+def defense_payloads(n: int, seed: int = 0) -> list:
+    df = game_states(n, seed)
+    cols = ["down", "ydstogo", "yardline_100", "qtr", "score_differential", "quarter_seconds_remaining"]
+    return [
+        {k: int(v) for k, v in zip(cols, row)}
+        for row in df[cols].itertuples(index=False, name=None)
+    ]
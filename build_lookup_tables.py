@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import joblib
+
+from app.core.lookup import OFFENSE_GRID, DEFENSE_GRID, build_table, file_sha256
+from app.core.features import offense_matrix_from_frame, defense_matrix_from_frame
+
+# ----------------------------------------------------------
+# Score the whole realistic game-state grid once per model
+# version and store it as a memory-mappable table that the
+# API answers from with an O(1) index lookup.
+#
+# usage: python build_lookup_tables.py [model_name ...]
+# ----------------------------------------------------------
+
+MODELS_DIR = "models"
+LOOKUP_DIR = os.path.join(MODELS_DIR, "lookup")
+
+TABLES = {
+    "offense_model": ("playcall_model.pkl", OFFENSE_GRID, offense_matrix_from_frame),
+    "def_pressure_model": ("def_pressure_model.pkl", DEFENSE_GRID, defense_matrix_from_frame),
+    "def_coverage_model": ("def_coverage_model.pkl", DEFENSE_GRID, defense_matrix_from_frame),
+    "def_front_model": ("def_front_model.pkl", DEFENSE_GRID, defense_matrix_from_frame),
+}
+
+names = sys.argv[1:] or list(TABLES)
+
+for name in names:
+    filename, axes, featurize = TABLES[name]
+    model_path = os.path.join(MODELS_DIR, filename)
+    print(f"\nBuilding lookup table for {name} ({model_path})...")
+
+    start = time.perf_counter()
+    model = joblib.load(model_path)
+    table = build_table(
+        model,
+        axes,
+        featurize,
+        os.path.join(LOOKUP_DIR, name),
+        model_sha256=file_sha256(model_path),
+    )
+
+    size_mb = table.probs.nbytes / 1e6
+    print(f"{name}: {table.probs.shape[0]} states, {size_mb:.1f} MB, {time.perf_counter() - start:.1f}s")
+
+print("\nLookup tables written to", LOOKUP_DIR)
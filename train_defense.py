@@ -1,124 +1,222 @@
-import pandas as pd
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+import pandas as pd
 import joblib
-import os
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score
 
-# ----------------------------------
-# Load engineered defensive dataset
-# ----------------------------------
-df = pd.read_parquet("data/plays_def_features.parquet")
+from app.core.features import DEFENSE_FEATURES, defense_matrix_from_frame
+from app.core.training import (
+    StageReport, MatrixCache, export_compact, grow_forest, holdout_games, latency_search, read_new_games,
+    training_arguments,
+)
 
-print("Dataset loaded:", df.shape)
-
-# ----------------------------------
-# Create simple engineered labels
-# ----------------------------------
-
-# ---- PRESSURE MODEL LABEL ----
-df["pressure_label"] = df["pressure"]  # already created earlier (sack OR hit OR TFL)
+DATA_PATH = "data/plays_def_features.parquet"
+MODELS_DIR = "models"
+# engineered X / labels / game ids of every game trained on so far (see --incremental)
+MATRIX_CACHE = os.path.join("data", "cache", "defense_matrices")
+GAME_COLUMN = "game_id"
 
+# raw columns the labels are derived from
+LABEL_INPUTS = ["pressure", "play_type", "pass_length", "qb_hit", "tackled_for_loss"]
 
-# ---- COVERAGE LABEL ----
-# Approximation using pass completion depth:
-# (This is a simplified placeholder until you add richer data)
+# target column -> saved model name
+TARGETS = {
+    "pressure_label": "def_pressure_model",
+    "coverage_label": "def_coverage_model",
+    "front_label": "def_front_model",
+}
 
-def estimate_coverage(row):
-    if row["play_type"] == "run":
-        return "Base"
-    if row["pass_length"] == "deep":
-        return "Cover 3"
-    if row["pass_length"] == "short":
-        return "Cover 1"
-    return "Unknown"
+# default forest, and the grid --search picks from (per target)
+FOREST_PARAMS = {"n_estimators": 250, "max_depth": 12}
+SEARCH_GRID = {"n_estimators": [50, 100, 250], "max_depth": [8, 10, 12, 14]}
+BASE_PARAMS = {"min_samples_split": 20, "random_state": 42}
 
-df["coverage_label"] = df.apply(estimate_coverage, axis=1)
+args = training_arguments("Train the pressure, coverage and front models")
+report = StageReport()
+cache = MatrixCache(MATRIX_CACHE)
 
-# Drop rows with Unknown coverage
-df = df[df["coverage_label"] != "Unknown"]
 
+# ----------------------------------
+# Create simple engineered labels
+# ----------------------------------
+def add_labels(df):
+    # ---- PRESSURE MODEL LABEL ----
+    df["pressure_label"] = df["pressure"]  # already created earlier (sack OR hit OR TFL)
+
+    # ---- COVERAGE LABEL ----
+    # Approximation using pass completion depth:
+    # (This is a simplified placeholder until you add richer data)
+    df["coverage_label"] = np.select(
+        [df["play_type"] == "run", df["pass_length"] == "deep", df["pass_length"] == "short"],
+        ["Base", "Cover 3", "Cover 1"],
+        default="Unknown",
+    )
 
-# ---- FRONT LABEL ----
-# Very rough approximation based on success metrics
-# You will improve this later
-
-def estimate_front(row):
+    # ---- FRONT LABEL ----
+    # Very rough approximation based on success metrics
+    # You will improve this later
     # 3-man front indicator: fewer QB hits AND fewer TFL
-    if row["qb_hit"] == 0 and row["tackled_for_loss"] == 0:
-        return "3-man"
     # 4-man fronts typically generate more hits/TFL
-    if row["qb_hit"] == 1 or row["tackled_for_loss"] == 1:
-        return "4-man"
-    return "Unknown"
+    df["front_label"] = np.select(
+        [
+            (df["qb_hit"] == 0) & (df["tackled_for_loss"] == 0),
+            (df["qb_hit"] == 1) | (df["tackled_for_loss"] == 1),
+        ],
+        ["3-man", "4-man"],
+        default="Unknown",
+    )
 
-df["front_label"] = df.apply(estimate_front, axis=1)
-df = df[df["front_label"] != "Unknown"]
+    # Drop rows with Unknown coverage or front
+    return df[(df["coverage_label"] != "Unknown") & (df["front_label"] != "Unknown")]
+
+
+def incremental_update():
+    """Label and featurize only games the matrix cache has not seen and grow the saved forests with them."""
+    with report.stage("load"):
+        df = read_new_games(DATA_PATH, GAME_COLUMN, cache.games(), DEFENSE_FEATURES + LABEL_INPUTS + [GAME_COLUMN])
+    print("New plays:", df.shape)
+
+    with report.stage("labels"):
+        df = add_labels(df)
+    if df.empty:
+        print("No new games")
+        return
+
+    with report.stage("features"):
+        X = defense_matrix_from_frame(df)
+        labels = {target: df[target].to_numpy() for target in TARGETS}
+        games = df[GAME_COLUMN].to_numpy()
+        del df
+
+    with report.stage("history"):
+        history = cache.sample(["X", "test", *TARGETS], args.history_rows)
+
+    # one model at a time, each using every core for its new trees
+    with report.stage("train"):
+        test = holdout_games(games)
+        for target_col, model_name in TARGETS.items():
+            path = os.path.join(MODELS_DIR, f"{model_name}.pkl")
+            y = labels[target_col]
+            if test is None:
+                grow_forest(path, X, y, args.new_trees, args.max_trees, prune=not args.no_prune,
+                            X_history=history["X"], y_history=history[target_col],
+                            test_history=history["test"])
+            else:
+                grow_forest(path, X[~test], y[~test], args.new_trees, args.max_trees,
+                            X_test=X[test], y_test=y[test], prune=not args.no_prune,
+                            X_history=history["X"], y_history=history[target_col],
+                            test_history=history["test"])
+
+    # recorded only once the models are saved, so a failed run picks the same games up again
+    with report.stage("cache"):
+        cache.append({"X": X, "games": games, "test": np.zeros(len(X), bool) if test is None else test, **labels})
+
+
+if args.incremental:
+    incremental_update()
+    report.summary()
+    sys.exit(0)
 
+# ----------------------------------
+# Load engineered defensive dataset (only the columns we use)
+# ----------------------------------
+with report.stage("load"):
+    df = pd.read_parquet(DATA_PATH, columns=DEFENSE_FEATURES + LABEL_INPUTS + [GAME_COLUMN])
+
+print("Dataset loaded:", df.shape)
+
+with report.stage("labels"):
+    df = add_labels(df)
 
 print("Labels created:")
-print(df[["pressure_label", "coverage_label", "front_label"]].head())
+print(df[list(TARGETS)].head())
 
 # ----------------------------------
-# Define features used by ALL models
+# One feature matrix and one split shared by ALL models
 # ----------------------------------
-feature_cols = [
-    "down",
-    "ydstogo",
-    "yardline_100",
-    "qtr",
-    "score_differential",
-    "quarter_seconds_remaining",
-]
+with report.stage("features"):
+    X = defense_matrix_from_frame(df)
+    labels = {target: df[target].to_numpy() for target in TARGETS}
+    games = df[GAME_COLUMN].to_numpy()
+    del df
 
-X = df[feature_cols]
+with report.stage("split"):
+    train_idx, test_idx = train_test_split(np.arange(len(X)), test_size=0.2, random_state=42)
+    X_train, X_test = X[train_idx], X[test_idx]
 
 # ----------------------------------------------------------
-# Helper function to train + save each defensive model
+# Optional: pick each model's size for the serving latency budget
 # ----------------------------------------------------------
+params = {name: FOREST_PARAMS for name in TARGETS.values()}
+if args.search:
+    with report.stage("search"):
+        for target_col, model_name in TARGETS.items():
+            params[model_name] = latency_search(
+                model_name, X_train, labels[target_col][train_idx], SEARCH_GRID, BASE_PARAMS, args.latency_budget_ms
+            )
 
-def train_and_save(target_col, model_name):
-    print(f"\nTraining {model_name} model...")
-
-    y = df[target_col]
+# ----------------------------------------------------------
+# Train the three defensive models concurrently
+# ----------------------------------------------------------
+# the forests share X_train (tree building releases the GIL), and each
+# gets an equal slice of the cores for its own trees
+TREE_JOBS = max(1, (os.cpu_count() or 1) // len(TARGETS))
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
 
+def train(target_col, model_name):
+    start = time.perf_counter()
     model = RandomForestClassifier(
-        n_estimators=250,
-        max_depth=12,
-        min_samples_split=20,
-        random_state=42
+        **params[model_name],
+        **BASE_PARAMS,
+        n_jobs=TREE_JOBS,
     )
+    model.fit(X_train, labels[target_col][train_idx])
+    # n_jobs is a training setting; single-row scoring in the API is faster without joblib dispatch
+    model.n_jobs = None
+    print(f"{model_name} trained in {time.perf_counter() - start:.1f}s")
+    return model
 
-    model.fit(X_train, y_train)
-
-    preds = model.predict(X_test)
-    acc = accuracy_score(y_test, preds)
-
-    print(f"{model_name} accuracy:", round(acc, 3))
-
-    # Make sure folder exists
-    os.makedirs("models", exist_ok=True)
-
-    # Save model
-    joblib.dump(model, f"models/{model_name}.pkl")
-    print(f"Saved: models/{model_name}.pkl")
-
-    return model, acc
 
+with report.stage("train"):
+    with ThreadPoolExecutor(max_workers=len(TARGETS)) as pool:
+        futures = {name: pool.submit(train, target, name) for target, name in TARGETS.items()}
+        models = {name: future.result() for name, future in futures.items()}
 
 # ----------------------------------------------------------
-# Train each defensive model
+# Evaluate + save each defensive model
 # ----------------------------------------------------------
-
-pressure_model, pressure_acc = train_and_save("pressure_label", "def_pressure_model")
-
-coverage_model, coverage_acc = train_and_save("coverage_label", "def_coverage_model")
-
-front_model, front_acc = train_and_save("front_label", "def_front_model")
-
+with report.stage("evaluate"):
+    for target_col, model_name in TARGETS.items():
+        preds = models[model_name].predict(X_test)
+        acc = accuracy_score(labels[target_col][test_idx], preds)
+        print(f"{model_name} accuracy:", round(acc, 3))
+
+with report.stage("save"):
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    for model_name, model in models.items():
+        # write then rename, so a running API's reload watcher never sees half a pickle
+        path = os.path.join(MODELS_DIR, f"{model_name}.pkl")
+        joblib.dump(model, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        print(f"Saved: {path}")
+
+# compact .npz exports, served with MODEL_FORMAT=compact
+with report.stage("export"):
+    for model_name, model in models.items():
+        export_compact(model, os.path.join(MODELS_DIR, f"{model_name}.pkl"), X_test, prune=not args.no_prune)
+
+# the next --incremental run only labels and featurizes games that are not in here
+# (and scores the history on the rows held out above)
+test = np.zeros(len(X), bool)
+test[test_idx] = True
+with report.stage("cache"):
+    cache.rebuild({"X": X, "games": games, "test": test, **labels})
+
+report.summary()
 print("\n🎉 All defensive models trained and saved successfully!")
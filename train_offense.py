@@ -1,65 +1,164 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 import joblib
 
-# 1️⃣ Load your dataset with explicit column names
+from app.core.features import OFFENSE_INPUTS, offense_matrix_from_frame
+from app.core.training import (
+    StageReport, MatrixCache, cached_ingest, export_compact, grow_forest, holdout_games, latency_search,
+    read_new_games, training_arguments,
+)
+
+# 1️⃣ Source dataset column names (the CSV header row is replaced by these)
 column_names = [
     "Date","GameID","Drive","qtr","down","time","TimeUnder","TimeSecs","PlayTimeDiff","SideofField","yrdln","yrdline100","ydstogo","ydsnet","GoalToGo","FirstDown","posteam","DefensiveTeam","desc","PlayAttempted","Yards.Gained","sp","Touchdown","ExPointResult","TwoPointConv","DefTwoPoint","Safety","Onsidekick","PuntResult","PlayType","Passer","Passer_ID","PassAttempt","PassOutcome","PassLength","AirYards","YardsAfterCatch","QBHit","PassLocation","InterceptionThrown","Interceptor","Rusher","Rusher_ID","RushAttempt","RunLocation","RunGap","Receiver","Receiver_ID","Reception","ReturnResult","Returner","BlockingPlayer","Tackler1","Tackler2","FieldGoalResult","FieldGoalDistance","Fumble","RecFumbTeam","RecFumbPlayer","Sack","Challenge.Replay","ChalReplayResult","Accepted.Penalty","PenalizedTeam","PenaltyType","PenalizedPlayer","Penalty.Yards","PosTeamScore","DefTeamScore","ScoreDiff","AbsScoreDiff","HomeTeam","AwayTeam","Timeout_Indicator","Timeout_Team","posteam_timeouts_pre","HomeTimeouts_Remaining_Pre","AwayTimeouts_Remaining_Pre","HomeTimeouts_Remaining_Post","AwayTimeouts_Remaining_Post","No_Score_Prob","Opp_Field_Goal_Prob","Opp_Safety_Prob","Opp_Touchdown_Prob","Field_Goal_Prob","Safety_Prob","Touchdown_Prob","ExPoint_Prob","TwoPoint_Prob","ExpPts","EPA","airEPA","yacEPA","Home_WP_pre","Away_WP_pre","Home_WP_post","Away_WP_post","Win_Prob","WPA","airWPA","yacWPA","Season"
 ]
-df = pd.read_csv("NFL Play by Play 2009-2016 (v3).csv", names=column_names, header=0, low_memory=False)
-print("Columns in DataFrame:", df.columns.tolist())
-
-# 2️⃣ Filter for relevant plays (column name is 'PlayType')
-df = df[df['PlayType'].isin(['pass', 'run','Run','Pass'])]
-
-
- # Feature engineering
-df["red_zone"] = df["yrdline100"] <= 20
-df["short_yard"] = df["ydstogo"] <= 2
-df["third_long"] = (df["down"] == 3) & (df["ydstogo"] >= 8)
-df["half"] = df["qtr"].apply(lambda x: 1 if x in [1, 2] else 0)
-
-# 3️⃣ Select useful features (update names to match provided columns)
-features = [
-    "down",
-    "ydstogo",
-    "qtr",
-    "yrdline100",
-    "red_zone",
-    "short_yard",
-    "third_long",
-    "half",
-    "ScoreDiff"
-]
-    # Add more features as needed from your list
 
+SOURCE_CSV = "NFL Play by Play 2009-2016 (v3).csv"
+CACHE_DIR = os.path.join("data", "cache")
+CHUNK_ROWS = 200_000
+PLAY_TYPES = ['pass', 'run', 'Run', 'Pass']
+
+# only the raw inputs and the label are parsed, with compact dtypes
+INGEST_DTYPES = {col: "float32" for col in OFFENSE_INPUTS}
+INGEST_DTYPES["PlayType"] = "str"
+INGEST_DTYPES["GameID"] = "int64"
+# bump when the projection or filters below change, so stale caches are not reused
+INGEST_VERSION = "v2"
+
+MODEL_PATH = "playcall_model.pkl"
+# engineered X / y / game ids of every game trained on so far (see --incremental)
+MATRIX_CACHE = os.path.join(CACHE_DIR, "playcall_matrices")
+
+# default forest, and the grid --search picks from
+FOREST_PARAMS = {"n_estimators": 100, "max_depth": 10}
+SEARCH_GRID = {"n_estimators": [25, 50, 100, 200], "max_depth": [6, 8, 10, 12, 14]}
+
+
+def read_plays(path):
+    """Stream the CSV in chunks, keeping relevant plays with complete inputs."""
+    reader = pd.read_csv(
+        path,
+        names=column_names,
+        header=0,
+        usecols=list(INGEST_DTYPES),
+        dtype=INGEST_DTYPES,
+        chunksize=CHUNK_ROWS,
+    )
+    for chunk in reader:
+        # 2️⃣ Filter for relevant plays (column name is 'PlayType')
+        chunk = chunk[chunk['PlayType'].isin(PLAY_TYPES)]
+        # 3️⃣ Clean missing values (derived features come from app.core.features,
+        # the same pipeline the API serves with)
+        yield chunk.dropna(subset=OFFENSE_INPUTS + ['PlayType'])[list(INGEST_DTYPES)]
+
+
+args = training_arguments("Train the offensive play-call model")
+report = StageReport()
+cache = MatrixCache(MATRIX_CACHE)
+
+
+def incremental_update():
+    """Featurize only games the matrix cache has not seen and grow the saved forest with them."""
+    # the CSV is parsed only if it changed since the last run (the parquet is shared with full runs)
+    with report.stage("ingest"):
+        cache_path = cached_ingest(SOURCE_CSV, CACHE_DIR, INGEST_VERSION, read_plays)
 
-# Clean missing values
-df = df.dropna(subset=features + ['PlayType'])
-df[features] = df[features].fillna(0)
+    with report.stage("load"):
+        df = read_new_games(cache_path, "GameID", cache.games(), list(INGEST_DTYPES))
+    print("New plays:", df.shape)
+    if df.empty:
+        print("No new games")
+        return
+
+    with report.stage("features"):
+        X = offense_matrix_from_frame(df)
+        y = df['PlayType'].to_numpy()
+        games = df["GameID"].to_numpy()
+        del df
+
+    with report.stage("history"):
+        history = cache.sample(["X", "y", "test"], args.history_rows)
+
+    with report.stage("train"):
+        test = holdout_games(games)
+        if test is None:
+            grow_forest(MODEL_PATH, X, y, args.new_trees, args.max_trees, prune=not args.no_prune,
+                        X_history=history["X"], y_history=history["y"], test_history=history["test"])
+        else:
+            grow_forest(MODEL_PATH, X[~test], y[~test], args.new_trees, args.max_trees,
+                        X_test=X[test], y_test=y[test], prune=not args.no_prune,
+                        X_history=history["X"], y_history=history["y"], test_history=history["test"])
+
+    # recorded only once the model is saved, so a failed run picks the same games up again
+    with report.stage("cache"):
+        cache.append({"X": X, "y": y, "games": games, "test": np.zeros(len(X), bool) if test is None else test})
+
+
+if args.incremental:
+    incremental_update()
+    report.summary()
+    sys.exit(0)
+
+# Parsing happens only when the source file (or INGEST_VERSION) changes;
+# otherwise retraining starts from the cached parquet
+with report.stage("ingest"):
+    cache_path = cached_ingest(SOURCE_CSV, CACHE_DIR, INGEST_VERSION, read_plays)
+
+with report.stage("load"):
+    df = pd.read_parquet(cache_path)
+print("Plays loaded:", df.shape)
 
 # 4️⃣ Split into X and y
-X = df[features]
-y = df['PlayType']
+with report.stage("features"):
+    X = offense_matrix_from_frame(df)
+    y = df['PlayType'].to_numpy()
+    games = df["GameID"].to_numpy()
+    del df
 
 # 5️⃣ Split data into train/test sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+train_idx, test_idx = train_test_split(np.arange(len(X)), test_size=0.2, random_state=42)
+X_train, X_test, y_train, y_test = X[train_idx], X[test_idx], y[train_idx], y[test_idx]
+
+# 6️⃣ Train a RandomForest model (optionally the best one for the latency budget)
+params = FOREST_PARAMS
+if args.search:
+    with report.stage("search"):
+        params = latency_search("playcall_model", X_train, y_train, SEARCH_GRID, {"random_state": 42}, args.latency_budget_ms)
 
-# 6️⃣ Train a RandomForest model
 clf = RandomForestClassifier(
-    n_estimators=100,
-    max_depth=10,
+    **params,
     random_state=42,
     n_jobs=-1
 )
-clf.fit(X_train, y_train)
+with report.stage("train"):
+    clf.fit(X_train, y_train)
+# n_jobs is a training setting; single-row scoring in the API is faster without joblib dispatch
+clf.n_jobs = None
 
 # 7️⃣ Evaluate accuracy
 print("✅ Model trained successfully")
-print("Accuracy:", clf.score(X_test, y_test))
+with report.stage("evaluate"):
+    print("Accuracy:", clf.score(X_test, y_test))
 
 # 8️⃣ Save model compatible with your local environment
-joblib.dump(clf, "playcall_model.pkl")
-print("💾 Model saved as playcall_model.pkl")
\ No newline at end of file
+joblib.dump(clf, MODEL_PATH + ".tmp")
+os.replace(MODEL_PATH + ".tmp", MODEL_PATH)
+print(f"💾 Model saved as {MODEL_PATH}")
+
+# 9️⃣ Compact export (served with MODEL_FORMAT=compact)
+with report.stage("export"):
+    export_compact(clf, MODEL_PATH, X_test, prune=not args.no_prune)
+
+# the next --incremental run only featurizes games that are not in here
+# (and scores the history on the rows held out above)
+test = np.zeros(len(X), bool)
+test[test_idx] = True
+with report.stage("cache"):
+    cache.rebuild({"X": X, "y": y, "games": games, "test": test})
+
+report.summary()
\ No newline at end of file